@@ -1,7 +1,10 @@
 from fastapi import APIRouter
+from app.api.v1.batch.api import router as batch_router
 from app.api.v1.compareTo.api import router as compare_to_router
 from app.api.v1.inline.api import router as inline_router
+from app.utils.responses import FastJSONResponse
 
-router = APIRouter(prefix="/v1")
+router = APIRouter(prefix="/v1", default_response_class=FastJSONResponse)
 router.include_router(compare_to_router)
 router.include_router(inline_router)
+router.include_router(batch_router)
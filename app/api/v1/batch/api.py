@@ -0,0 +1,143 @@
+import asyncio
+from typing import AsyncIterator, Tuple
+import httpx
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from app.core.config import settings
+from app.core.targets import TARGETS
+from app.core.upstream import fetch_upstream
+from app.utils.responses import FastJSONResponse, dumps
+from app.api.v1.batch.schemas import BatchQuery, BatchRequest, BatchResult
+
+router = APIRouter(prefix="/batch", tags=["Batch"])
+
+
+async def run_query(
+    query: BatchQuery, request: Request, semaphore: asyncio.Semaphore
+) -> Tuple[BatchResult, dict]:
+    """Run one batch query. Upstream failures are reported on the item."""
+    target = TARGETS[(query.product, query.vertical)]
+    try:
+        async with semaphore:
+            response = await fetch_upstream(request, target, query.payload)
+        body = response.json()
+    except HTTPException as exc:
+        return (
+            BatchResult(
+                product=query.product,
+                vertical=query.vertical,
+                status="error",
+                status_code=exc.status_code,
+                error=exc.detail,
+            ),
+            {},
+        )
+    except (httpx.HTTPError, ValueError) as exc:
+        return (
+            BatchResult(
+                product=query.product,
+                vertical=query.vertical,
+                status="error",
+                error=str(exc) or type(exc).__name__,
+            ),
+            {},
+        )
+
+    return (
+        BatchResult(
+            product=query.product,
+            vertical=query.vertical,
+            status="ok",
+            status_code=response.status_code,
+            response=body,
+            stale=response.stale,
+        ),
+        response.cookies,
+    )
+
+
+@router.post(
+    "",
+    summary="Retrieve several ad lists in one call",
+    description="""
+Run several inline and compareTo ad queries concurrently.
+
+**Request Body Fields**:
+- `queries` (list, required): Ad queries, each with:
+  - `product` (str, required): `inline` or `compareTo`.
+  - `vertical` (str, required): `hotel`, `flight` or `car`.
+  - `payload` (object, required): Request body of the matching single-query endpoint.
+
+Results are returned in query order, each with its own `status`, upstream
+`status_code` and `response`, so one failing query does not fail the batch.
+""",
+    response_description="Per-query ads responses",
+)
+async def get_batch(payload: BatchRequest, request: Request):
+    semaphore = asyncio.Semaphore(settings.BATCH_MAX_CONCURRENCY)
+    outcomes = await asyncio.gather(
+        *(run_query(query, request, semaphore) for query in payload.queries)
+    )
+
+    json_response = FastJSONResponse(
+        content={"results": [result.model_dump() for result, _ in outcomes]},
+    )
+
+    for _, cookies in outcomes:
+        for key, value in cookies.items():
+            json_response.set_cookie(key=key, value=value)
+
+    return json_response
+
+
+def sse_event(event: str, data: dict, event_id: int | None = None) -> str:
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append("data: " + dumps(data).decode("utf-8"))
+    return "\n".join(lines) + "\n\n"
+
+
+async def stream_results(payload: BatchRequest, request: Request) -> AsyncIterator[str]:
+    semaphore = asyncio.Semaphore(settings.BATCH_MAX_CONCURRENCY)
+
+    async def indexed(index: int, query: BatchQuery):
+        result, _ = await run_query(query, request, semaphore)
+        return index, result
+
+    tasks = [
+        asyncio.ensure_future(indexed(index, query))
+        for index, query in enumerate(payload.queries)
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            index, result = await next_done
+            yield sse_event("result", {"index": index, **result.model_dump()}, index)
+        yield sse_event("done", {"count": len(tasks)})
+    finally:
+        # The client went away before every query finished.
+        for task in tasks:
+            task.cancel()
+
+
+@router.post(
+    "/stream",
+    summary="Stream several ad lists as they arrive",
+    description="""
+Run the same queries as `/batch`, but stream each result as a Server-Sent
+Event as soon as its upstream call completes, so fast verticals can render
+before slow ones.
+
+Each `result` event carries the query `index` and the same fields as a
+`/batch` result. A final `done` event reports the number of queries.
+Upstream cookies are not forwarded on this endpoint, because response
+headers are sent before the first result is known.
+""",
+    response_description="Server-Sent Events stream of per-query ads responses",
+)
+async def get_batch_stream(payload: BatchRequest, request: Request):
+    return StreamingResponse(
+        stream_results(payload, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,99 @@
+from typing import Annotated, Any, List, Literal, Optional, Union
+from pydantic import BaseModel, Discriminator, Field, Tag
+from app.core.config import settings
+from app.api.v1.inline import schemas as inline
+from app.api.v1.compareTo import schemas as compare_to
+
+
+class InlineHotelQuery(BaseModel):
+    product: Literal["inline"]
+    vertical: Literal["hotel"]
+    payload: inline.HotelInlineRequest
+
+
+class InlineFlightQuery(BaseModel):
+    product: Literal["inline"]
+    vertical: Literal["flight"]
+    payload: inline.FlightInlineRequest
+
+
+class InlineCarQuery(BaseModel):
+    product: Literal["inline"]
+    vertical: Literal["car"]
+    payload: inline.CarInlineRequest
+
+
+class CompareToHotelQuery(BaseModel):
+    product: Literal["compareTo"]
+    vertical: Literal["hotel"]
+    payload: compare_to.HotelInlineRequest
+
+
+class CompareToFlightQuery(BaseModel):
+    product: Literal["compareTo"]
+    vertical: Literal["flight"]
+    payload: compare_to.FlightInlineRequest
+
+
+class CompareToCarQuery(BaseModel):
+    product: Literal["compareTo"]
+    vertical: Literal["car"]
+    payload: compare_to.CarInlineRequest
+
+
+def _query_tag(value: Any) -> Optional[str]:
+    if isinstance(value, dict):
+        return f"{value.get('product')}:{value.get('vertical')}"
+    return f"{getattr(value, 'product', None)}:{getattr(value, 'vertical', None)}"
+
+
+BatchQuery = Annotated[
+    Union[
+        Annotated[InlineHotelQuery, Tag("inline:hotel")],
+        Annotated[InlineFlightQuery, Tag("inline:flight")],
+        Annotated[InlineCarQuery, Tag("inline:car")],
+        Annotated[CompareToHotelQuery, Tag("compareTo:hotel")],
+        Annotated[CompareToFlightQuery, Tag("compareTo:flight")],
+        Annotated[CompareToCarQuery, Tag("compareTo:car")],
+    ],
+    Discriminator(_query_tag),
+]
+
+
+class BatchRequest(BaseModel):
+    """
+    Batch Ads API Request Payload
+
+    Fields:
+        queries (List[BatchQuery]): Required. Ad queries to run. Each names a
+            `product` (`inline` or `compareTo`), a `vertical` (`hotel`,
+            `flight` or `car`) and the `payload` accepted by the matching
+            single-query endpoint.
+    """
+
+    queries: List[BatchQuery] = Field(
+        min_length=1, max_length=settings.BATCH_MAX_QUERIES
+    )
+
+
+class BatchResult(BaseModel):
+    """
+    Batch Ads API Result Item
+
+    Fields:
+        product (str): Ad product of the query.
+        vertical (str): Vertical of the query.
+        status (str): `ok` when the upstream answered, `error` otherwise.
+        status_code (int | None): Upstream status code.
+        response (Any): Upstream response body.
+        error (str | None): Error description when `status` is `error`.
+        stale (bool): Whether the response is a stale cached fallback.
+    """
+
+    product: str
+    vertical: str
+    status: Literal["ok", "error"]
+    status_code: Optional[int] = None
+    response: Any = None
+    error: Optional[str] = None
+    stale: bool = False
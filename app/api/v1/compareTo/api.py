@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Request
-from fastapi.responses import JSONResponse
-import requests
-from app.utils.constants import constants
-from app.core.config import settings
+from typing import Optional
+from fastapi import APIRouter, Depends, Request
+from app.core.decoding import ads_body
+from app.core.projection import Projection, response_projection
+from app.core.targets import TARGETS
+from app.core.upstream import ads_response, fetch_upstream
 from app.api.v1.compareTo.schemas import (
     HotelInlineRequest,
     CarInlineRequest,
@@ -35,45 +36,14 @@ Fetch a list of **CompareTo hotel advertisements**.
 """,
     response_description="CompareTo hotel ads response",
 )
-def get_hotel_list(payload: HotelInlineRequest, request: Request):
-    url = constants.BASE_URL_COMPARETO + constants.HOTEL_LIST_ENDPOINT
-    params = {
-        "apiKey": settings.COMPARETO_ADS_API_KEY,
-        "userTrackId": payload.userTrackId,
-    }
-    headers = {
-        "Content-Type": "application/json",
-        "User-Agent": payload.userAgent,
-        "x-original-client-ip": payload.clientIP,
-    }
-    payload_data = {
-        "showOn": payload.showOn,
-        "checkinDate": payload.checkinDate,
-        "checkoutDate": payload.checkoutDate,
-        "cityId": payload.cityId,
-    }
-
-    response = requests.post(
-        url,
-        params=params,
-        headers=headers,
-        json=payload_data,
-        cookies=request.cookies or {},
-    )
-
-    cookies = dict(response.cookies)
-
-    json_response = JSONResponse(
-        content={
-            "status_code": response.status_code,
-            "response": response.json(),
-        },
-    )
-
-    for key, value in cookies.items():
-        json_response.set_cookie(key=key, value=value)
-
-    return json_response
+async def get_hotel_list(
+    request: Request,
+    payload: HotelInlineRequest = ads_body(HotelInlineRequest),
+    projection: Optional[Projection] = Depends(response_projection),
+):
+    target = TARGETS[("compareTo", "hotel")]
+    response = await fetch_upstream(request, target, payload)
+    return ads_response(response, request, projection)
 
 
 @router.post(
@@ -99,40 +69,14 @@ Fetch a list of **CompareTo flight advertisements**.
 """,
     response_description="CompareTo flight ads response",
 )
-def get_flight_list(payload: FlightInlineRequest, request: Request):
-    url = constants.BASE_URL_COMPARETO + constants.FLIGHT_LIST_ENDPOINT
-    params = {
-        "apiKey": settings.COMPARETO_ADS_API_KEY,
-        "userTrackId": payload.userTrackId,
-    }
-    headers = {
-        "Content-Type": "application/json",
-        "User-Agent": payload.userAgent,
-        "x-original-client-ip": payload.clientIP,
-    }
-    payload_data = payload.model_dump(
-        exclude={"userTrackId", "clientIP", "cookies", "userAgent"}, exclude_unset=True
-    )
-
-    response = requests.post(
-        url,
-        params=params,
-        headers=headers,
-        json=payload_data,
-        cookies=request.cookies or {},
-    )
-
-    cookies = dict(response.cookies)
-
-    json_response = JSONResponse(
-        content={
-            "status_code": response.status_code,
-            "response": response.json(),
-        },
-    )
-    for key, value in cookies.items():
-        json_response.set_cookie(key=key, value=value)
-    return json_response
+async def get_flight_list(
+    request: Request,
+    payload: FlightInlineRequest = ads_body(FlightInlineRequest),
+    projection: Optional[Projection] = Depends(response_projection),
+):
+    target = TARGETS[("compareTo", "flight")]
+    response = await fetch_upstream(request, target, payload)
+    return ads_response(response, request, projection)
 
 
 @router.post(
@@ -158,39 +102,11 @@ Fetch a list of **CompareTo car rental advertisements**.
 """,
     response_description="CompareTo car rental ads response",
 )
-def get_car_list(payload: CarInlineRequest, request: Request):
-    url = constants.BASE_URL_COMPARETO + constants.CAR_LIST_ENDPOINT
-    params = {
-        "apiKey": settings.COMPARETO_ADS_API_KEY,
-        "userTrackId": payload.userTrackId,
-    }
-    headers = {
-        "Content-Type": "application/json",
-        "User-Agent": payload.userAgent,
-        "x-original-client-ip": payload.clientIP,
-    }
-    payload_data = payload.model_dump(
-        exclude={"userTrackId", "clientIP", "cookies", "userAgent"}, exclude_unset=True
-    )
-
-    response = requests.post(
-        url,
-        params=params,
-        headers=headers,
-        json=payload_data,
-        cookies=request.cookies or {},
-    )
-
-    cookies = dict(response.cookies)
-
-    json_response = JSONResponse(
-        content={
-            "status_code": response.status_code,
-            "response": response.json(),
-        },
-    )
-
-    for key, value in cookies.items():
-        json_response.set_cookie(key=key, value=value)
-
-    return json_response
+async def get_car_list(
+    request: Request,
+    payload: CarInlineRequest = ads_body(CarInlineRequest),
+    projection: Optional[Projection] = Depends(response_projection),
+):
+    target = TARGETS[("compareTo", "car")]
+    response = await fetch_upstream(request, target, payload)
+    return ads_response(response, request, projection)
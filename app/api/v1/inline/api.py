@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Request
-from fastapi.responses import JSONResponse
-import requests
-from app.utils.constants import constants
-from app.core.config import settings
+from typing import Optional
+from fastapi import APIRouter, Depends, Request
+from app.core.decoding import ads_body
+from app.core.projection import Projection, response_projection
+from app.core.targets import TARGETS
+from app.core.upstream import ads_response, fetch_upstream
 from app.api.v1.inline.schemas import (
     HotelInlineRequest,
     FlightInlineRequest,
@@ -35,39 +36,14 @@ Fetch a list of inline hotel advertisements.
 """,
     response_description="Inline hotel ads response",
 )
-def get_hotel_list(payload: HotelInlineRequest, request: Request):
-    url = constants.BASE_URL_INLINE + constants.HOTEL_LIST_ENDPOINT
-    params = {"apiKey": settings.INLINE_ADS_API_KEY, "userTrackId": payload.userTrackId}
-    headers = {
-        "Content-Type": "application/json",
-        "User-Agent": payload.userAgent,
-        "x-original-client-ip": payload.clientIP,
-    }
-    payload_data = payload.model_dump(
-        exclude={"userTrackId", "clientIP", "cookies", "userAgent"}, exclude_unset=True
-    )
-
-    response = requests.post(
-        url,
-        params=params,
-        headers=headers,
-        json=payload_data,
-        cookies=request.cookies or {},
-    )
-
-    cookies = dict(response.cookies)
-
-    json_response = JSONResponse(
-        content={
-            "status_code": response.status_code,
-            "response": response.json(),
-        },
-    )
-
-    for key, value in cookies.items():
-        json_response.set_cookie(key=key, value=value)
-
-    return json_response
+async def get_hotel_list(
+    request: Request,
+    payload: HotelInlineRequest = ads_body(HotelInlineRequest),
+    projection: Optional[Projection] = Depends(response_projection),
+):
+    target = TARGETS[("inline", "hotel")]
+    response = await fetch_upstream(request, target, payload)
+    return ads_response(response, request, projection)
 
 
 @router.post(
@@ -90,41 +66,14 @@ Fetch a list of inline flight advertisements.
 """,
     response_description="Inline flight ads response",
 )
-def get_flight_list(payload: FlightInlineRequest, request: Request):
-    url = constants.BASE_URL_INLINE + constants.FLIGHT_LIST_ENDPOINT
-    params = {"apiKey": settings.INLINE_ADS_API_KEY, "userTrackId": payload.userTrackId}
-    headers = {
-        "Content-Type": "application/json",
-        "User-Agent": payload.userAgent,
-        "x-original-client-ip": payload.clientIP,
-    }
-    payload_data = payload.model_dump(
-        exclude={"userTrackId", "clientIP", "cookies", "userAgent"}, exclude_unset=True
-    )
-
-    print(payload_data)
-
-    response = requests.post(
-        url,
-        params=params,
-        headers=headers,
-        json=payload_data,
-        cookies=request.cookies or {},
-    )
-
-    cookies = dict(response.cookies)
-
-    json_response = JSONResponse(
-        content={
-            "status_code": response.status_code,
-            "response": response.json(),
-        },
-    )
-
-    for key, value in cookies.items():
-        json_response.set_cookie(key=key, value=value)
-
-    return json_response
+async def get_flight_list(
+    request: Request,
+    payload: FlightInlineRequest = ads_body(FlightInlineRequest),
+    projection: Optional[Projection] = Depends(response_projection),
+):
+    target = TARGETS[("inline", "flight")]
+    response = await fetch_upstream(request, target, payload)
+    return ads_response(response, request, projection)
 
 
 @router.post(
@@ -150,33 +99,11 @@ Fetch a list of inline car rental advertisements.
 """,
     response_description="Inline car rental ads response",
 )
-def get_car_list(payload: CarInlineRequest, request: Request):
-    url = constants.BASE_URL_INLINE + constants.CAR_LIST_ENDPOINT
-    params = {"apiKey": settings.INLINE_ADS_API_KEY, "userTrackId": payload.userTrackId}
-    headers = {
-        "Content-Type": "application/json",
-        "User-Agent": payload.userAgent,
-        "x-original-client-ip": payload.clientIP,
-    }
-    payload_data = payload.model_dump(
-        exclude={"userTrackId", "clientIP", "cookies", "userAgent"}, exclude_unset=True
-    )
-
-    response = requests.post(
-        url,
-        params=params,
-        headers=headers,
-        json=payload_data,
-        cookies=request.cookies or {},
-    )
-
-    cookies = dict(response.cookies)
-    json_response = JSONResponse(
-        content={
-            "status_code": response.status_code,
-            "response": response.json(),
-        },
-    )
-    for key, value in cookies.items():
-        json_response.set_cookie(key=key, value=value)
-    return json_response
+async def get_car_list(
+    request: Request,
+    payload: CarInlineRequest = ads_body(CarInlineRequest),
+    projection: Optional[Projection] = Depends(response_projection),
+):
+    target = TARGETS[("inline", "car")]
+    response = await fetch_upstream(request, target, payload)
+    return ads_response(response, request, projection)
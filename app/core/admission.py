@@ -0,0 +1,159 @@
+import asyncio
+import heapq
+import itertools
+from typing import List, Sequence
+from app.core.config import settings
+from app.core.timing import checkpoint, phase
+
+
+class AdmissionController:
+    """
+    Cap concurrent in-flight requests with a bounded, prioritized wait queue.
+
+    A request that finds every slot taken waits in the queue for at most
+    `max_queue_time` seconds; a request that finds the queue full, or times
+    out in it, is rejected. Freed slots go to the waiter with the lowest
+    priority number, first come first served within a priority.
+
+    Waiters that time out or are cancelled leave a dead entry in the heap.
+    Once there are more than `max_queue` of them the heap is rebuilt without
+    them, so it stays bounded however long low priorities wait.
+    """
+
+    def __init__(self, max_in_flight: int, max_queue: int, max_queue_time: float):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_queue_time = max_queue_time
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._queue: List[tuple] = []
+        self._dead = 0
+        self._sequence = itertools.count()
+
+    async def acquire(self, priority: int = 0) -> bool:
+        if self.in_flight < self.max_in_flight and not self.waiting:
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            return False
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        heapq.heappush(self._queue, (priority, next(self._sequence), future))
+        self.waiting += 1
+        expiry = loop.call_later(self.max_queue_time, self._expire, future)
+        try:
+            granted = await future
+        except asyncio.CancelledError:
+            # The client went away while queued.
+            if future.done() and not future.cancelled() and future.result():
+                self.release()
+            raise
+        finally:
+            expiry.cancel()
+            self.waiting -= 1
+            if future.cancelled() or not future.result():
+                self._discard()
+        if granted:
+            self.admitted += 1
+        return granted
+
+    def release(self) -> None:
+        while self._queue:
+            _, _, future = heapq.heappop(self._queue)
+            if not future.done():
+                # Hand the slot straight to the next waiter.
+                future.set_result(True)
+                return
+            self._dead -= 1
+        self.in_flight -= 1
+
+    def _discard(self) -> None:
+        self._dead += 1
+        if self._dead > self.max_queue:
+            self._queue = [entry for entry in self._queue if not entry[2].done()]
+            heapq.heapify(self._queue)
+            self._dead = 0
+
+    def _expire(self, future: asyncio.Future) -> None:
+        if not future.done():
+            self.timed_out += 1
+            self.rejected += 1
+            future.set_result(False)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying admission control to paths under `path_prefix`.
+    Requests over capacity get an immediate 503 with `Retry-After` instead of
+    queueing until the client gives up. Paths under one of
+    `priority_prefixes` are admitted from the queue first. The wait is
+    timed as the `queue` Server-Timing phase.
+    """
+
+    def __init__(
+        self,
+        app,
+        controller: AdmissionController,
+        path_prefix: str = "/app",
+        priority_prefixes: Sequence[str] = (),
+        retry_after: int = 1,
+    ):
+        self.app = app
+        self.controller = controller
+        self.path_prefix = path_prefix
+        self.priority_prefixes = tuple(priority_prefixes)
+        self.retry_after = str(retry_after).encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        priority = 0 if scope["path"].startswith(self.priority_prefixes) else 1
+        with phase("queue"):
+            admitted = await self.controller.acquire(priority)
+        if not admitted:
+            await self.reject(send)
+            return
+        checkpoint()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release()
+
+    async def reject(self, send) -> None:
+        body = b'{"detail":"Server over capacity"}'
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode("latin-1")),
+                    (b"retry-after", self.retry_after),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+admission_controller = AdmissionController(
+    settings.ADMISSION_MAX_IN_FLIGHT,
+    settings.ADMISSION_MAX_QUEUE,
+    settings.ADMISSION_MAX_QUEUE_TIME,
+)
@@ -0,0 +1,124 @@
+import time
+from collections import deque
+from typing import Dict, Iterable, Optional
+from app.core.config import settings
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreaker:
+    """
+    Per-endpoint circuit breaker.
+
+    The circuit opens after `failure_threshold` consecutive failures and
+    rejects calls for `recovery_timeout` seconds. It then turns half-open and
+    lets a single probe through: a success closes it, a failure opens it
+    again. A probe that never reports back is replaced after another
+    `recovery_timeout`.
+
+    Outcomes are reported with the time the call started. Calls that
+    started before the last state change, such as slow calls admitted
+    before the circuit opened, are ignored, so only the probe can close an
+    open circuit.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, recovery_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.rejected = 0
+        self.opened_at = 0.0
+        self.changed_at = 0.0
+        self.transitions: deque = deque(maxlen=20)
+        self._probe_started_at: Optional[float] = None
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+        if self.state == OPEN and now - self.opened_at >= self.recovery_timeout:
+            self._transition(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            probe = self._probe_started_at
+            if probe is None or now - probe >= self.recovery_timeout:
+                self._probe_started_at = now
+                return True
+        if self.state == CLOSED:
+            return True
+        self.rejected += 1
+        return False
+
+    def _is_current(self, started_at: float) -> bool:
+        return self.state != OPEN and started_at >= self.changed_at
+
+    def record_success(self, started_at: float) -> None:
+        if not self._is_current(started_at):
+            return
+        self.failures = 0
+        if self.state != CLOSED:
+            self._transition(CLOSED)
+
+    def record_failure(self, started_at: float) -> None:
+        if not self._is_current(started_at):
+            return
+        self.failures += 1
+        if self.state == HALF_OPEN or (
+            self.state == CLOSED and self.failures >= self.failure_threshold
+        ):
+            self.opened_at = time.monotonic()
+            self._transition(OPEN)
+
+    def _transition(self, state: str) -> None:
+        self.transitions.append(
+            {"from": self.state, "to": state, "at": round(time.time(), 3)}
+        )
+        self.state = state
+        self.changed_at = time.monotonic()
+        self._probe_started_at = None
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "transitions": list(self.transitions),
+        }
+
+
+class CircuitBreakers:
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            breaker = self._breakers[name] = CircuitBreaker(
+                name,
+                settings.CIRCUIT_FAILURE_THRESHOLD,
+                settings.CIRCUIT_RECOVERY_TIMEOUT,
+            )
+        return breaker
+
+    def any_open(self) -> bool:
+        return any(breaker.state != CLOSED for breaker in self._breakers.values())
+
+    def stats(self) -> dict:
+        return {name: breaker.stats() for name, breaker in self._breakers.items()}
+
+    def collect(self) -> Iterable[str]:
+        yield "# HELP circuit_breaker_state Circuit state (0 closed, 1 half-open, 2 open)."
+        yield "# TYPE circuit_breaker_state gauge"
+        for name, breaker in self._breakers.items():
+            state = STATE_VALUES[breaker.state]
+            yield f'circuit_breaker_state{{endpoint="{name}"}} {state}'
+
+
+def is_failure_status(status_code: int) -> bool:
+    return status_code >= 500 or status_code == 429
+
+
+circuit_breakers = CircuitBreakers()
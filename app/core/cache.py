@@ -0,0 +1,389 @@
+import asyncio
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+from pydantic import BaseModel
+from app.core.config import settings
+from app.core.targets import UpstreamTarget
+
+
+class CacheEntry(NamedTuple):
+    status_code: int
+    content: bytes
+    expires_at: float
+    # Encoded response envelopes for this entry, keyed by (view, coding).
+    variants: dict
+
+
+class ResponseCache:
+    """
+    Bounded in-process TTL cache with LRU eviction.
+
+    Entries only hold the upstream status code and body. Upstream cookies are
+    never stored, so a cached hit cannot hand one user's `Set-Cookie` values
+    to another. Expired entries are kept until evicted so they can still be
+    served as stale fallbacks.
+
+    Lookups are coroutines so that subclasses backed by a shared store can
+    wait for it without blocking the event loop.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_hits = 0
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        entry = self._lookup(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def _lookup(self, key: str) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at <= time.monotonic():
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    async def ttl_remaining(self, key: str) -> Optional[float]:
+        """Seconds until `key` expires, or None if it is not cached or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        remaining = entry.expires_at - time.monotonic()
+        return remaining if remaining > 0 else None
+
+    async def get_stale(self, key: str, max_age: float) -> Optional[CacheEntry]:
+        """
+        Return an entry even if it has expired, as long as it expired less
+        than `max_age` seconds ago. Used as a fallback while upstream is down.
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at + max_age <= time.monotonic():
+            return None
+        self.stale_hits += 1
+        return entry
+
+    def set(
+        self, key: str, status_code: int, content: bytes, ttl: float
+    ) -> Optional[CacheEntry]:
+        if ttl <= 0 or self.max_entries <= 0:
+            return None
+        entry = CacheEntry(status_code, content, time.monotonic() + ttl, {})
+        self._put(key, entry)
+        return entry
+
+    def _put(self, key: str, entry: CacheEntry) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "stale_hits": self.stale_hits,
+        }
+
+
+class SharedStore(ABC):
+    """
+    Response store shared by all worker processes on a host. Expiry times
+    are wall-clock timestamps, since monotonic clocks are per process.
+
+    Methods block; `SharedResponseCache` calls them off the event loop.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Tuple[int, bytes, float]]:
+        """Return `(status_code, content, expires_at)` or None, as a use."""
+
+    @abstractmethod
+    def expires_at(self, key: str) -> Optional[float]:
+        """Return the expiry time of `key`, without counting it as a use."""
+
+    @abstractmethod
+    def set(self, key: str, status_code: int, content: bytes, expires_at: float):
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+
+class SQLiteStore(SharedStore):
+    """
+    Shared store in a SQLite database in WAL mode, so readers in every
+    worker run concurrently with a writer.
+
+    Reads are plain SELECTs. The keys they return are remembered and their
+    `accessed_at` is updated in one transaction every `TOUCH_BATCH` reads or
+    on the next write. Every `PRUNE_EVERY` writes the table is trimmed back
+    to `max_entries` rows, least recently used first; expired rows are kept
+    until then for stale fallbacks. `busy_timeout` bounds how long a call
+    waits on another process's write lock. Errors are counted and treated
+    as misses, leaving the in-process tier to serve requests.
+
+    Not thread-safe: all calls must come from the same thread.
+    """
+
+    # Writes between two eviction passes.
+    PRUNE_EVERY = 100
+    # Reads whose recency update is batched into one write.
+    TOUCH_BATCH = 100
+
+    def __init__(self, path: str, max_entries: int, busy_timeout: float):
+        self.path = path
+        self.max_entries = max_entries
+        self.busy_timeout = busy_timeout
+        self.errors = 0
+        self.entries: Optional[int] = None
+        self._writes = 0
+        self._touched: Dict[str, float] = {}
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        # Connections must not be shared with workers forked after opening.
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(
+                self.path,
+                timeout=self.busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, status_code INTEGER NOT NULL, "
+                "content BLOB NOT NULL, expires_at REAL NOT NULL, "
+                "accessed_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed_at "
+                "ON responses (accessed_at)"
+            )
+            self._connection, self._pid = connection, os.getpid()
+            self._touched.clear()
+            self._count()
+        return self._connection
+
+    def _count(self) -> None:
+        (self.entries,) = self._connection.execute(
+            "SELECT COUNT(*) FROM responses"
+        ).fetchone()
+
+    def _flush_touched(self, connection: sqlite3.Connection) -> None:
+        if not self._touched:
+            return
+        touched = [(accessed_at, key) for key, accessed_at in self._touched.items()]
+        self._touched.clear()
+        with connection:
+            connection.execute("BEGIN")
+            connection.executemany(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", touched
+            )
+
+    def get(self, key: str) -> Optional[Tuple[int, bytes, float]]:
+        try:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT status_code, content, expires_at FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is not None:
+                self._touched[key] = time.time()
+                if len(self._touched) >= self.TOUCH_BATCH:
+                    self._flush_touched(connection)
+        except sqlite3.Error:
+            self.errors += 1
+            return None
+        return row
+
+    def expires_at(self, key: str) -> Optional[float]:
+        try:
+            row = (
+                self._connect()
+                .execute("SELECT expires_at FROM responses WHERE key = ?", (key,))
+                .fetchone()
+            )
+        except sqlite3.Error:
+            self.errors += 1
+            return None
+        return row[0] if row is not None else None
+
+    def set(self, key: str, status_code: int, content: bytes, expires_at: float):
+        try:
+            connection = self._connect()
+            self._touched.pop(key, None)
+            self._flush_touched(connection)
+            connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, status_code, content, expires_at, time.time()),
+            )
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                connection.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+                    "ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+                self._count()
+        except sqlite3.Error:
+            self.errors += 1
+
+    def clear(self) -> None:
+        try:
+            self._connect().execute("DELETE FROM responses")
+            self._touched.clear()
+            self.entries = 0
+        except sqlite3.Error:
+            self.errors += 1
+
+    def stats(self) -> dict:
+        # Counted on connect and at every eviction pass, not per call.
+        return {"entries": self.entries, "errors": self.errors}
+
+
+class SharedResponseCache(ResponseCache):
+    """
+    In-process cache in front of a `SharedStore` used by every worker on the
+    host. Local misses are looked up in the shared store and copied into the
+    local tier for the rest of their TTL; writes go to both tiers.
+
+    Store calls run on a single dedicated thread, so they neither block the
+    event loop nor need a lock. Writes to the store are queued on that
+    thread without waiting for them. Compressed and projected variants stay
+    process-local. `hits` counts hits in either tier, `shared_hits` the ones
+    served from the shared store; a miss is a miss in both.
+    """
+
+    def __init__(self, max_entries: int, store: SharedStore):
+        super().__init__(max_entries)
+        self.store = store
+        self.shared_hits = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pid: Optional[int] = None
+
+    def _store_executor(self) -> ThreadPoolExecutor:
+        # Executor threads do not survive a fork into a worker process.
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(1, thread_name_prefix="shared-cache")
+            self._pid = os.getpid()
+        return self._executor
+
+    def _call_store(self, method: Callable, *args) -> "asyncio.Future":
+        return asyncio.get_running_loop().run_in_executor(
+            self._store_executor(), method, *args
+        )
+
+    async def _load(self, key: str, max_age: float) -> Optional[CacheEntry]:
+        row = await self._call_store(self.store.get, key)
+        if row is None:
+            return None
+        status_code, content, expires_at = row
+        remaining = expires_at - time.time()
+        if remaining + max_age <= 0:
+            return None
+        entry = CacheEntry(status_code, content, time.monotonic() + remaining, {})
+        self._put(key, entry)
+        return entry
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        entry = self._lookup(key)
+        if entry is None:
+            entry = await self._load(key, 0.0)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.shared_hits += 1
+        self.hits += 1
+        return entry
+
+    async def ttl_remaining(self, key: str) -> Optional[float]:
+        # The shared store sees refreshes done by the other workers.
+        expires_at = await self._call_store(self.store.expires_at, key)
+        if expires_at is None:
+            return await super().ttl_remaining(key)
+        remaining = expires_at - time.time()
+        return remaining if remaining > 0 else None
+
+    async def get_stale(self, key: str, max_age: float) -> Optional[CacheEntry]:
+        entry = await super().get_stale(key, max_age)
+        if entry is None:
+            entry = await self._load(key, max_age)
+            if entry is not None:
+                self.stale_hits += 1
+        return entry
+
+    def set(
+        self, key: str, status_code: int, content: bytes, ttl: float
+    ) -> Optional[CacheEntry]:
+        entry = super().set(key, status_code, content, ttl)
+        if entry is not None:
+            self._store_executor().submit(
+                self.store.set, key, status_code, content, time.time() + ttl
+            )
+        return entry
+
+    def clear(self) -> None:
+        super().clear()
+        self._store_executor().submit(self.store.clear).result()
+
+    def stats(self) -> dict:
+        shared = self.store.stats()
+        return {
+            **super().stats(),
+            "shared_hits": self.shared_hits,
+            "shared_entries": shared.get("entries"),
+            "shared_errors": shared.get("errors"),
+        }
+
+
+def create_response_cache() -> ResponseCache:
+    """Build the response cache for the configured `CACHE_BACKEND`."""
+    if settings.CACHE_BACKEND == "sqlite":
+        if not settings.CACHE_SQLITE_PATH:
+            raise ValueError("CACHE_BACKEND=sqlite requires CACHE_SQLITE_PATH")
+        store = SQLiteStore(
+            settings.CACHE_SQLITE_PATH,
+            settings.CACHE_SQLITE_MAX_ENTRIES,
+            settings.CACHE_SQLITE_BUSY_TIMEOUT,
+        )
+        return SharedResponseCache(settings.CACHE_MAX_ENTRIES, store)
+    return ResponseCache(settings.CACHE_MAX_ENTRIES)
+
+
+def cache_key(target: UpstreamTarget, payload: BaseModel) -> str:
+    """
+    Build the cache key of an ad query from the upstream URL and the exact
+    upstream request body, so two queries share an entry only when the
+    upstream would see the same query. Per-user fields never go into the
+    body.
+    """
+    return target.url + "|" + target.body(payload).decode("utf-8")
+
+
+response_cache = create_response_cache()
@@ -0,0 +1,148 @@
+import gzip
+from typing import Callable, Dict, Optional, Sequence
+from starlette.datastructures import Headers, MutableHeaders
+from app.core.config import settings
+from app.core.timing import phase
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+
+def _gzip(body: bytes) -> bytes:
+    return gzip.compress(body, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+ENCODERS: Dict[str, Callable[[bytes], bytes]] = {"gzip": _gzip}
+
+if brotli is not None:
+
+    def _brotli(body: bytes) -> bytes:
+        return brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)
+
+    ENCODERS["br"] = _brotli
+
+if zstandard is not None:
+    ENCODERS["zstd"] = zstandard.ZstdCompressor(
+        level=settings.COMPRESSION_ZSTD_LEVEL
+    ).compress
+
+
+class ResponseCompressor:
+    """
+    Content-coding negotiation and compression for response bodies.
+
+    `encodings` is the server preference order; codings whose library is not
+    installed are dropped. Among the codings the client accepts, the one
+    with the highest q-value wins, ties going to the server preference.
+    """
+
+    def __init__(self, encodings: Sequence[str], minimum_size: int):
+        self.encodings = tuple(name for name in encodings if name in ENCODERS)
+        self.minimum_size = minimum_size
+        self.compressed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def negotiate(self, accept_encoding: Optional[str]) -> Optional[str]:
+        if not accept_encoding:
+            return None
+        accepted = {}
+        for part in accept_encoding.split(","):
+            name, _, params = part.partition(";")
+            quality = 1.0
+            params = params.strip()
+            if params.startswith("q="):
+                try:
+                    quality = float(params[2:])
+                except ValueError:
+                    quality = 0.0
+            accepted[name.strip().lower()] = quality
+        wildcard = accepted.get("*", 0.0)
+        best, best_quality = None, 0.0
+        for name in self.encodings:
+            quality = accepted.get(name, wildcard)
+            if quality > best_quality:
+                best, best_quality = name, quality
+        return best
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        encoded = ENCODERS[encoding](body)
+        self.compressed += 1
+        self.bytes_in += len(body)
+        self.bytes_out += len(encoded)
+        return encoded
+
+    def stats(self) -> dict:
+        return {
+            "encodings": list(self.encodings),
+            "compressed": self.compressed,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+        }
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing responses under `path_prefix` with the coding
+    negotiated from `Accept-Encoding`.
+
+    Bodies smaller than the compressor's minimum size, streamed responses
+    and responses that already carry a `Content-Encoding` (e.g. compressed
+    cached envelopes) are sent unchanged.
+    """
+
+    def __init__(self, app, compressor: ResponseCompressor, path_prefix: str = "/app"):
+        self.app = app
+        self.compressor = compressor
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        encoding = self.compressor.negotiate(
+            Headers(scope=scope).get("accept-encoding")
+        )
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if start is None:
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=list(start["headers"]))
+            body = message.get("body", b"")
+            if "content-encoding" not in headers:
+                headers.add_vary_header("Accept-Encoding")
+                if (
+                    encoding is not None
+                    and not message.get("more_body", False)
+                    and len(body) >= self.compressor.minimum_size
+                ):
+                    with phase("compress"):
+                        body = self.compressor.compress(body, encoding)
+                    headers["Content-Encoding"] = encoding
+                    headers["Content-Length"] = str(len(body))
+                    message = {"type": "http.response.body", "body": body}
+            await send({**start, "headers": headers.raw})
+            start = None
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
+
+
+response_compressor = ResponseCompressor(
+    settings.COMPRESSION_ENCODINGS, settings.COMPRESSION_MINIMUM_SIZE
+)
@@ -1,3 +1,6 @@
+import os
+import tempfile
+from typing import Dict, List, Optional
 from pydantic_settings import BaseSettings
 
 
@@ -5,6 +8,188 @@ class Settings(BaseSettings):
     INLINE_ADS_API_KEY: str
     COMPARETO_ADS_API_KEY: str
 
+    # Override the affiliate API host, e.g. to point at the benchmark stub
+    AFFILIATE_HOST: Optional[str] = None
+
+    # Admission control for the /app routes. Over capacity, requests wait up
+    # to ADMISSION_MAX_QUEUE_TIME seconds in a bounded queue, then get a 503.
+    # Paths under ADMISSION_PRIORITY_PREFIXES leave the queue first.
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_MAX_IN_FLIGHT: int = 200
+    ADMISSION_MAX_QUEUE: int = 200
+    ADMISSION_MAX_QUEUE_TIME: float = 1.0
+    ADMISSION_RETRY_AFTER: int = 1
+    ADMISSION_PRIORITY_PREFIXES: List[str] = ["/app/v1/inline"]
+
+    # Upstream connection pools, one per target (e.g. "inline/car"). The
+    # *_BY_TARGET settings override the default for individual targets.
+    UPSTREAM_MAX_CONNECTIONS: int = 50
+    UPSTREAM_MAX_CONNECTIONS_BY_TARGET: Dict[str, int] = {}
+    UPSTREAM_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    UPSTREAM_KEEPALIVE_EXPIRY: float = 30.0
+
+    # HTTP/2 to the affiliate host (requires the `h2` package), the TTL of
+    # the upstream DNS cache (0 disables it) and connections opened per
+    # target at startup
+    UPSTREAM_HTTP2: bool = False
+    UPSTREAM_DNS_CACHE_TTL: float = 60.0
+    UPSTREAM_PREWARM_CONNECTIONS: int = 2
+    UPSTREAM_PREWARM_TIMEOUT: float = 5.0
+
+    # Bulkheads: concurrent upstream calls allowed per target. A call waits
+    # at most BULKHEAD_MAX_WAIT seconds for a slot before a 503.
+    BULKHEAD_CONCURRENCY: int = 50
+    BULKHEAD_CONCURRENCY_BY_TARGET: Dict[str, int] = {}
+    BULKHEAD_MAX_WAIT: float = 0.05
+
+    # Upstream timeouts per vertical (seconds)
+    UPSTREAM_CONNECT_TIMEOUT_HOTEL: float = 2.0
+    UPSTREAM_READ_TIMEOUT_HOTEL: float = 5.0
+    UPSTREAM_CONNECT_TIMEOUT_FLIGHT: float = 2.0
+    UPSTREAM_READ_TIMEOUT_FLIGHT: float = 8.0
+    UPSTREAM_CONNECT_TIMEOUT_CAR: float = 2.0
+    UPSTREAM_READ_TIMEOUT_CAR: float = 10.0
+
+    # Overall request deadline (seconds). Clients can ask for a shorter one
+    # with the X-Request-Deadline-Ms header, capped at REQUEST_DEADLINE_MAX.
+    REQUEST_DEADLINE_DEFAULT: Optional[float] = None
+    REQUEST_DEADLINE_MAX: float = 30.0
+
+    # Hedged upstream requests, capped at HEDGE_BUDGET_RATIO of upstream
+    # requests across all targets
+    HEDGE_ENABLED: bool = False
+    HEDGE_PERCENTILE: float = 0.95
+    HEDGE_WINDOW: int = 500
+    HEDGE_MIN_SAMPLES: int = 50
+    HEDGE_MIN_DELAY: float = 0.05
+    HEDGE_BUDGET_RATIO: float = 0.1
+    HEDGE_BUDGET_MAX_TOKENS: float = 10.0
+
+    # Response cache (TTLs in seconds)
+    CACHE_ENABLED: bool = True
+    CACHE_MAX_ENTRIES: int = 10000
+    CACHE_TTL_HOTEL: float = 300.0
+    CACHE_TTL_FLIGHT: float = 120.0
+    CACHE_TTL_CAR: float = 300.0
+
+    # Negative caching: upstream JSON responses with these statuses (e.g. an
+    # unknown identifier) are cached for CACHE_NEGATIVE_TTL seconds
+    CACHE_NEGATIVE_STATUSES: List[int] = [400, 404, 422]
+    CACHE_NEGATIVE_TTL: float = 300.0
+
+    # Cache backend: "memory" (per process) or "sqlite", an in-process tier
+    # in front of a SQLite (WAL) database shared by all workers on the host.
+    # The sqlite backend needs CACHE_SQLITE_PATH, in a directory only the
+    # service can write to: whoever can write the file can inject responses.
+    CACHE_BACKEND: str = "memory"
+    CACHE_SQLITE_PATH: Optional[str] = None
+    CACHE_SQLITE_MAX_ENTRIES: int = 100000
+    CACHE_SQLITE_BUSY_TIMEOUT: float = 0.05
+
+    # Cache warmer: every WARMER_INTERVAL seconds, re-fetch up to
+    # WARMER_BUDGET of the WARMER_TOP_KEYS most requested queries per vertical
+    # whose cache entries expire within WARMER_REFRESH_AHEAD seconds. Warm-up
+    # calls are sent with the WARMER_* identity below instead of the last
+    # requester's (no client IP header when WARMER_CLIENT_IP is unset).
+    WARMER_ENABLED: bool = True
+    WARMER_INTERVAL: float = 30.0
+    WARMER_BUDGET: int = 30
+    WARMER_CONCURRENCY: int = 4
+    WARMER_TOP_KEYS: int = 50
+    WARMER_CAPACITY: int = 500
+    WARMER_REFRESH_AHEAD: float = 60.0
+    WARMER_USER_TRACK_ID: str = "cache-warmer"
+    WARMER_USER_AGENT: str = "redirect-api-cache-warmer"
+    WARMER_CLIENT_IP: Optional[str] = None
+
+    # Collapse identical concurrent upstream calls
+    SINGLE_FLIGHT_ENABLED: bool = True
+
+    # Splice raw upstream JSON into the response envelope instead of
+    # parsing and re-serializing it
+    RESPONSE_PASSTHROUGH: bool = True
+
+    # Field projections for ad responses. Clients select paths with the
+    # `fields` query parameter or a named view, e.g.
+    # {"compact": ["ads.logoUrl", "ads.price", "ads.deepLink"]}.
+    PROJECTION_VIEWS: Dict[str, List[str]] = {}
+    PROJECTION_MAX_FIELDS: int = 50
+
+    # Response compression for /app routes, negotiated from Accept-Encoding.
+    # COMPRESSION_ENCODINGS is the server preference; br and zstd are only
+    # used when the brotli / zstandard packages are installed.
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    COMPRESSION_ENCODINGS: List[str] = ["zstd", "br", "gzip"]
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 5
+    COMPRESSION_ZSTD_LEVEL: int = 3
+
+    # Upstream retries with exponential backoff and full jitter. Retries are
+    # capped at RETRY_BUDGET_RATIO of upstream requests across all targets.
+    RETRY_ENABLED: bool = True
+    RETRY_MAX_ATTEMPTS: int = 3
+    RETRY_STATUSES: List[int] = [502, 503, 504]
+    RETRY_BACKOFF_BASE: float = 0.05
+    RETRY_BACKOFF_MAX: float = 1.0
+    RETRY_BUDGET_RATIO: float = 0.1
+    RETRY_BUDGET_MAX_TOKENS: float = 10.0
+
+    # Structured JSON-lines logs for requests and upstream calls, written by
+    # a background thread from a bounded queue (records are dropped when it
+    # is full). LOG_FILE defaults to stdout. Errors are never sampled out.
+    LOG_ENABLED: bool = True
+    LOG_FILE: Optional[str] = None
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_ACCESS_SAMPLE_RATE: float = 1.0
+    LOG_UPSTREAM_SAMPLE_RATE: float = 1.0
+
+    # Per-phase request timings in a Server-Timing response header
+    SERVER_TIMING_ENABLED: bool = False
+
+    # Sampled cProfile capture: sampled requests slower than
+    # PROFILE_THRESHOLD seconds have their profile written to PROFILE_DIR.
+    PROFILE_ENABLED: bool = False
+    PROFILE_SAMPLE_RATE: float = 0.01
+    PROFILE_THRESHOLD: float = 0.5
+    PROFILE_DIR: str = os.path.join(tempfile.gettempdir(), "redirect_api_profiles")
+
+    # Local pre-validation of ad queries (dates, airport codes and, when
+    # PREVALIDATION_CITY_IDS_FILE is set, city ids) before any upstream call.
+    # The airport codes default to the file bundled in app/data. Dates up to
+    # PREVALIDATION_PAST_SLACK_DAYS before today (UTC) are accepted.
+    PREVALIDATION_ENABLED: bool = True
+    PREVALIDATION_AIRPORT_CODES_FILE: Optional[str] = None
+    PREVALIDATION_CITY_IDS_FILE: Optional[str] = None
+    PREVALIDATION_PAST_SLACK_DAYS: int = 1
+
+    # Circuit breaker per upstream endpoint. While open, expired cache
+    # entries up to CIRCUIT_STALE_MAX_AGE seconds past their TTL are served.
+    CIRCUIT_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_RECOVERY_TIMEOUT: float = 10.0
+    CIRCUIT_STALE_MAX_AGE: float = 3600.0
+
+    # Validate ad request bodies straight from raw JSON bytes with
+    # pydantic-core instead of FastAPI's dict-based body pipeline. The
+    # OpenAPI docs do not show the single-route request bodies in this mode.
+    FAST_REQUEST_DECODING: bool = False
+
+    # Adaptive (AIMD) concurrency limit per upstream target. The limit backs
+    # off, at most once per round trip, on 429/503, transport errors, or a
+    # p90 latency over ADAPTIVE_LIMIT_WINDOW calls above
+    # ADAPTIVE_LIMIT_LATENCY_TOLERANCE times the unloaded baseline.
+    ADAPTIVE_LIMIT_ENABLED: bool = True
+    ADAPTIVE_LIMIT_INITIAL: int = 20
+    ADAPTIVE_LIMIT_MIN: int = 2
+    ADAPTIVE_LIMIT_MAX: int = 200
+    ADAPTIVE_LIMIT_BACKOFF: float = 0.7
+    ADAPTIVE_LIMIT_LATENCY_TOLERANCE: float = 3.0
+    ADAPTIVE_LIMIT_WINDOW: int = 100
+
+    # Batch endpoint
+    BATCH_MAX_QUERIES: int = 20
+    BATCH_MAX_CONCURRENCY: int = 6
+
     class Config:
         env_file = ".env.sample"
         case_sensitive = True
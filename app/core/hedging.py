@@ -0,0 +1,137 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+import httpx
+from app.core.config import settings
+from app.core.retry import RetryBudget
+
+# One upstream attempt; called with True for a hedge, which returns None
+# when it could not be sent.
+Attempt = Callable[[bool], Awaitable[Optional[httpx.Response]]]
+
+# Recompute the hedge threshold every this many observations instead of
+# sorting the window on every request.
+RECOMPUTE_EVERY = 20
+
+
+class LatencyTracker:
+    """Rolling window of upstream latencies with a cached percentile."""
+
+    def __init__(self, window: int, percentile: float, min_samples: int):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.threshold: Optional[float] = None
+        self._samples: deque = deque(maxlen=window)
+        self._since_recompute = 0
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self._since_recompute += 1
+        if self._since_recompute >= RECOMPUTE_EVERY:
+            self._since_recompute = 0
+            self._recompute()
+
+    def _recompute(self) -> None:
+        if len(self._samples) < self.min_samples:
+            self.threshold = None
+            return
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile))
+        self.threshold = ordered[index]
+
+
+class Hedger:
+    """
+    Send a second, hedged upstream attempt when the first one is slower than
+    the target's recent latency percentile, and use whichever answers first.
+
+    Hedges are capped by a token budget shared by all targets, like retries,
+    so a slowdown that pushes most calls past the threshold cannot double
+    the load on the upstream. A hedge is also skipped, after using its
+    token, when the target has no free bulkhead or concurrency slot.
+    """
+
+    def __init__(self, budget: RetryBudget):
+        self.budget = budget
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.skipped = 0
+        self.budget_exhausted = 0
+        self._trackers: Dict[str, LatencyTracker] = {}
+
+    def tracker(self, name: str) -> LatencyTracker:
+        tracker = self._trackers.get(name)
+        if tracker is None:
+            tracker = self._trackers[name] = LatencyTracker(
+                settings.HEDGE_WINDOW,
+                settings.HEDGE_PERCENTILE,
+                settings.HEDGE_MIN_SAMPLES,
+            )
+        return tracker
+
+    async def send(self, name: str, attempt: Attempt) -> httpx.Response:
+        """
+        Run `attempt(False)` and, if it is slow, `attempt(True)` as a hedge.
+        A hedge attempt returns None when it could not be sent.
+        """
+        tracker = self.tracker(name)
+        delay = tracker.threshold
+        if settings.HEDGE_ENABLED:
+            self.budget.deposit()
+        if not settings.HEDGE_ENABLED or delay is None:
+            started = time.perf_counter()
+            response = await attempt(False)
+            tracker.observe(time.perf_counter() - started)
+            return response
+
+        delay = max(delay, settings.HEDGE_MIN_DELAY)
+        started = time.perf_counter()
+        first = asyncio.ensure_future(attempt(False))
+        attempts = {first}
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=delay)
+            if not done:
+                if self.budget.withdraw():
+                    self.hedged += 1
+                    attempts.add(asyncio.ensure_future(attempt(True)))
+                else:
+                    self.budget_exhausted += 1
+            while True:
+                done, attempts = await asyncio.wait(
+                    attempts, return_when=asyncio.FIRST_COMPLETED
+                )
+                finished = [task for task in done if not task.exception()]
+                succeeded = [task for task in finished if task.result() is not None]
+                self.skipped += len(finished) - len(succeeded)
+                # Only give up on failed attempts once none is left running.
+                if succeeded or not attempts:
+                    break
+            # The first attempt always returns a response or raises.
+            winner = succeeded[0] if succeeded else first
+            response = winner.result()
+            if winner is not first:
+                self.hedge_wins += 1
+            tracker.observe(time.perf_counter() - started)
+            return response
+        finally:
+            for task in attempts:
+                task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": settings.HEDGE_ENABLED,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "skipped": self.skipped,
+            "budget_exhausted": self.budget_exhausted,
+            "budget_tokens": round(self.budget.tokens, 2),
+            "thresholds": {
+                name: tracker.threshold for name, tracker in self._trackers.items()
+            },
+        }
+
+
+hedger = Hedger(
+    RetryBudget(settings.HEDGE_BUDGET_RATIO, settings.HEDGE_BUDGET_MAX_TOKENS)
+)
@@ -0,0 +1,256 @@
+import asyncio
+import ipaddress
+import socket
+import time
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+import httpx
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from app.core.config import settings
+from app.core.singleflight import SingleFlight
+
+if TYPE_CHECKING:
+    from app.core.targets import UpstreamTarget
+
+try:
+    import h2
+except ImportError:  # pragma: no cover - depends on the environment
+    h2 = None
+
+# HTTP/2 needs the optional `h2` package; without it clients use HTTP/1.1.
+UPSTREAM_HTTP2 = settings.UPSTREAM_HTTP2 and h2 is not None
+
+
+class DNSCache:
+    """
+    TTL cache of upstream host addresses, shared by every upstream client so
+    new connections skip the resolver. Concurrent lookups of a host are
+    collapsed into one. If a refresh fails, the expired addresses keep being
+    used. An address that fails to connect is moved to the end of its list.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.hits = 0
+        self.lookups = 0
+        self.errors = 0
+        self.failovers = 0
+        self._entries: Dict[Tuple[str, int], Tuple[List[str], float]] = {}
+        self._lookups = SingleFlight()
+
+    async def resolve(
+        self, host: str, port: int, timeout: Optional[float]
+    ) -> List[str]:
+        """
+        Addresses of `host`, in the order to try them. Raises `OSError` or
+        `asyncio.TimeoutError` when the host cannot be resolved.
+        """
+        entry = self._entries.get((host, port))
+        now = time.monotonic()
+        if entry is not None and entry[1] > now:
+            self.hits += 1
+            return entry[0]
+        try:
+            infos, _ = await asyncio.wait_for(
+                self._lookups.do(f"{host}:{port}", lambda: self._lookup(host, port)),
+                timeout,
+            )
+        except (OSError, asyncio.TimeoutError):
+            self.errors += 1
+            if entry is not None:
+                return entry[0]
+            raise
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        self._entries[(host, port)] = (addresses, now + self.ttl)
+        return addresses
+
+    def demote(self, host: str, port: int, address: str) -> None:
+        """Try `address` last from now on, after it failed to connect."""
+        self.failovers += 1
+        entry = self._entries.get((host, port))
+        if entry is not None and address in entry[0]:
+            addresses = [other for other in entry[0] if other != address]
+            self._entries[(host, port)] = (addresses + [address], entry[1])
+
+    async def _lookup(self, host: str, port: int) -> list:
+        self.lookups += 1
+        loop = asyncio.get_running_loop()
+        return await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+
+    def stats(self) -> dict:
+        return {
+            "hosts": len(self._entries),
+            "hits": self.hits,
+            "lookups": self.lookups,
+            "errors": self.errors,
+            "failovers": self.failovers,
+        }
+
+
+def _is_ip_address(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return True
+
+
+class CachedDNSTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport sending requests to the addresses of their host from a
+    `DNSCache`, trying each address in turn when connecting fails.
+
+    The wrapped transport sees the address in the URL. The `Host` header and
+    the TLS server name (which certificates are verified against) stay the
+    original host name, as does the request seen by the client.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, cache: DNSCache):
+        self.transport = transport
+        self.cache = cache
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        url = request.url
+        if _is_ip_address(url.host):
+            return await self.transport.handle_async_request(request)
+        port = url.port or (443 if url.scheme == "https" else 80)
+        timeout = request.extensions.get("timeout", {}).get("connect")
+        try:
+            addresses = await self.cache.resolve(url.host, port, timeout)
+        except asyncio.TimeoutError as exc:
+            raise httpx.ConnectTimeout(
+                f"Resolving {url.host} timed out", request=request
+            ) from exc
+        except OSError as exc:
+            raise httpx.ConnectError(str(exc), request=request) from exc
+
+        extensions = {**request.extensions, "sni_hostname": url.host}
+        for index, address in enumerate(addresses):
+            resolved = httpx.Request(
+                request.method,
+                url.copy_with(host=address),
+                headers=request.headers,
+                stream=request.stream,
+                extensions=extensions,
+            )
+            try:
+                return await self.transport.handle_async_request(resolved)
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                # Nothing was sent yet, so the next address is safe to try.
+                if index == len(addresses) - 1:
+                    raise
+                self.cache.demote(url.host, port, address)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+dns_cache = DNSCache(settings.UPSTREAM_DNS_CACHE_TTL)
+
+
+def create_http_client(
+    max_connections: int, max_keepalive_connections: int
+) -> httpx.AsyncClient:
+    """
+    Build a shared upstream HTTP client.
+
+    Clients are created once per process by the app lifespan and reused by
+    every handler, so connections to the affiliate host are kept alive and
+    pooled instead of being opened per request.
+
+    The client cookie jar rejects every cookie: upstream `Set-Cookie` values
+    belong to the end user of a single request and must never be replayed on
+    another user's request through the shared client.
+
+    With `UPSTREAM_HTTP2` concurrent calls are multiplexed over a few
+    connections when the upstream negotiates h2. Upstream hosts are resolved
+    through the shared DNS cache.
+    """
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=settings.UPSTREAM_KEEPALIVE_EXPIRY,
+    )
+    transport = httpx.AsyncHTTPTransport(limits=limits, http2=UPSTREAM_HTTP2)
+    if settings.UPSTREAM_DNS_CACHE_TTL > 0:
+        transport = CachedDNSTransport(transport, dns_cache)
+    return httpx.AsyncClient(
+        transport=transport,
+        cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+    )
+
+
+def create_http_clients(
+    targets: Iterable["UpstreamTarget"],
+) -> Dict[str, httpx.AsyncClient]:
+    """One client, and so one connection pool, per upstream target."""
+    clients = {}
+    for target in targets:
+        max_connections = settings.UPSTREAM_MAX_CONNECTIONS_BY_TARGET.get(
+            target.name, settings.UPSTREAM_MAX_CONNECTIONS
+        )
+        clients[target.name] = create_http_client(
+            max_connections,
+            min(max_connections, settings.UPSTREAM_MAX_KEEPALIVE_CONNECTIONS),
+        )
+    return clients
+
+
+async def _prewarm(client: httpx.AsyncClient, url: httpx.URL) -> bool:
+    try:
+        await client.head(url)
+    except httpx.HTTPError:
+        return False
+    return True
+
+
+async def prewarm_http_clients(
+    clients: Dict[str, httpx.AsyncClient], targets: Iterable["UpstreamTarget"]
+) -> int:
+    """
+    Open `UPSTREAM_PREWARM_CONNECTIONS` connections per target before the
+    app takes traffic, so first requests skip DNS, TCP and TLS setup. Each
+    connection is opened by a concurrent `HEAD /` to the upstream origin.
+    Returns the number of successful requests; failures are ignored, and
+    the whole step is bounded by `UPSTREAM_PREWARM_TIMEOUT`.
+    """
+    warm = [
+        _prewarm(clients[target.name], httpx.URL(target.url).join("/"))
+        for target in targets
+        for _ in range(settings.UPSTREAM_PREWARM_CONNECTIONS)
+    ]
+    try:
+        results = await asyncio.wait_for(
+            asyncio.gather(*warm), settings.UPSTREAM_PREWARM_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        return 0
+    return sum(results)
+
+
+def upstream_timeout(connect: float, read: float) -> httpx.Timeout:
+    return httpx.Timeout(connect=connect, read=read, write=read, pool=connect)
+
+
+UPSTREAM_TIMEOUTS = {
+    "hotel": upstream_timeout(
+        settings.UPSTREAM_CONNECT_TIMEOUT_HOTEL, settings.UPSTREAM_READ_TIMEOUT_HOTEL
+    ),
+    "flight": upstream_timeout(
+        settings.UPSTREAM_CONNECT_TIMEOUT_FLIGHT, settings.UPSTREAM_READ_TIMEOUT_FLIGHT
+    ),
+    "car": upstream_timeout(
+        settings.UPSTREAM_CONNECT_TIMEOUT_CAR, settings.UPSTREAM_READ_TIMEOUT_CAR
+    ),
+}
+
+
+def cookie_header(cookies: dict) -> dict:
+    """Forward the incoming request cookies as an explicit `Cookie` header."""
+    if not cookies:
+        return {}
+    return {"Cookie": "; ".join(f"{key}={value}" for key, value in cookies.items())}
+
+
+def response_cookies(response: httpx.Response) -> dict:
+    """Return the cookies set by an upstream response as a flat dict."""
+    return {cookie.name: cookie.value for cookie in response.cookies.jar}
@@ -0,0 +1,175 @@
+import asyncio
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+from app.core.config import settings
+
+# Upstream answers that mean "you are sending too much".
+OVERLOAD_STATUSES = frozenset({429, 503})
+
+# Window latency percentile compared with the baseline, and the number of
+# recent windows the baseline is the fastest of.
+LATENCY_PERCENTILE = 0.9
+BASELINE_WINDOWS = 100
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit for one upstream target.
+
+    Every call that completes without an overload signal raises the limit by
+    `1 / limit` (about +1 per round trip of a full window). A 429 or 503, a
+    transport error, or a slow window multiplies it by `backoff`, at most
+    once per round trip: calls that started before the last backoff were
+    sent under the old limit and do not back off again.
+
+    A window is `window` calls. It is slow when its p90 latency is above
+    `latency_tolerance` times the baseline, the lowest window p90 of the
+    last `BASELINE_WINDOWS` windows: a long-horizon estimate of the unloaded
+    latency, which still follows a lasting change of the upstream. Single
+    slow calls from normal latency jitter therefore do not lower the limit.
+    Callers over the limit wait for a slot in arrival order.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        minimum: int,
+        maximum: int,
+        backoff: float,
+        latency_tolerance: float,
+        window: int,
+    ):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.window = window
+        self.in_flight = 0
+        self.drops = 0
+        self._window_latencies: deque = deque(maxlen=BASELINE_WINDOWS)
+        self._window_latency: Optional[float] = None
+        self._samples: List[float] = []
+        self._backed_off_at = float("-inf")
+        self._waiters: deque = deque()
+
+    async def acquire(self) -> None:
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just before the cancellation.
+                self.release(None, None)
+            else:
+                future.cancel()
+            raise
+
+    def try_acquire(self) -> bool:
+        """Take a slot only if one is free right away."""
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return True
+        return False
+
+    def release(self, latency: Optional[float], dropped: Optional[bool]) -> None:
+        """
+        Free a slot and adapt the limit. `dropped` is None when the call was
+        abandoned (cancelled) and says nothing about upstream health.
+        """
+        self.in_flight -= 1
+        if dropped is not None:
+            self._adapt(latency, dropped)
+        while self._waiters and self.in_flight < int(self.limit):
+            future = self._waiters.popleft()
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+
+    def _adapt(self, latency: Optional[float], dropped: bool) -> None:
+        now = time.perf_counter()
+        if dropped:
+            started = now - latency if latency is not None else now
+            self._back_off(now, started)
+            return
+        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        if latency is not None:
+            self._samples.append(latency)
+            if len(self._samples) >= self.window:
+                self._end_window(now)
+
+    def _end_window(self, now: float) -> None:
+        samples = sorted(self._samples)
+        self._samples = []
+        latency = samples[int(len(samples) * LATENCY_PERCENTILE)]
+        self._window_latency = latency
+        baseline = self.baseline
+        self._window_latencies.append(latency)
+        if baseline is not None and latency > baseline * self.latency_tolerance:
+            # Treated like a call of that latency finishing now.
+            self._back_off(now, now - latency)
+
+    def _back_off(self, now: float, started: float) -> None:
+        if started < self._backed_off_at:
+            return
+        self._backed_off_at = now
+        self.drops += 1
+        self.limit = max(self.minimum, self.limit * self.backoff)
+
+    @property
+    def baseline(self) -> Optional[float]:
+        return min(self._window_latencies, default=None)
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for future in self._waiters if not future.done())
+
+    def stats(self) -> dict:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "drops": self.drops,
+            "baseline_latency": self.baseline,
+            "window_latency": self._window_latency,
+        }
+
+
+class AdaptiveLimiters:
+    def __init__(self):
+        self._limiters: Dict[str, AdaptiveLimiter] = {}
+
+    def get(self, name: str) -> AdaptiveLimiter:
+        limiter = self._limiters.get(name)
+        if limiter is None:
+            limiter = self._limiters[name] = AdaptiveLimiter(
+                settings.ADAPTIVE_LIMIT_INITIAL,
+                settings.ADAPTIVE_LIMIT_MIN,
+                settings.ADAPTIVE_LIMIT_MAX,
+                settings.ADAPTIVE_LIMIT_BACKOFF,
+                settings.ADAPTIVE_LIMIT_LATENCY_TOLERANCE,
+                settings.ADAPTIVE_LIMIT_WINDOW,
+            )
+        return limiter
+
+    def stats(self) -> dict:
+        return {name: limiter.stats() for name, limiter in self._limiters.items()}
+
+    def collect(self) -> Iterable[str]:
+        yield "# HELP upstream_concurrency_limit Adaptive upstream concurrency limit."
+        yield "# TYPE upstream_concurrency_limit gauge"
+        for name, limiter in self._limiters.items():
+            yield f'upstream_concurrency_limit{{endpoint="{name}"}} {limiter.limit}'
+        yield "# HELP upstream_concurrency_waiting Calls waiting for an upstream slot."
+        yield "# TYPE upstream_concurrency_waiting gauge"
+        for name, limiter in self._limiters.items():
+            waiting = limiter.waiting
+            yield f'upstream_concurrency_waiting{{endpoint="{name}"}} {waiting}'
+
+
+adaptive_limiters = AdaptiveLimiters()
@@ -0,0 +1,159 @@
+import queue
+import random
+import sys
+import threading
+import time
+from typing import BinaryIO, Optional
+from app.core.config import settings
+from app.utils.responses import dumps
+
+_STOP = object()
+
+# Records written per write() call by the background writer.
+WRITE_BATCH = 256
+
+
+class StructuredLog:
+    """
+    JSON-lines log written by a background thread.
+
+    `log()` only appends the record to a bounded queue and never waits: when
+    the queue is full the record is dropped and counted. Serialization and
+    file I/O happen on the writer thread, off the event loop. Records can be
+    sampled; callers pass a rate of 1.0 for records that must be kept.
+    """
+
+    def __init__(self, max_queue: int):
+        self.written = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self.write_errors = 0
+        self._queue: "queue.Queue" = queue.Queue(max_queue)
+        self._thread: Optional[threading.Thread] = None
+
+    def log(self, record: dict, sample_rate: float = 1.0) -> None:
+        if sample_rate < 1.0 and random.random() >= sample_rate:
+            self.sampled_out += 1
+            return
+        record["ts"] = time.time()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self, stream: BinaryIO) -> None:
+        self._thread = threading.Thread(
+            target=self._run, args=(stream,), name="structured-log", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Flush queued records and stop the writer. Blocks; run it in a thread."""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self, stream: BinaryIO) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < WRITE_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = _STOP in batch
+            records = [record for record in batch if record is not _STOP]
+            try:
+                stream.write(b"".join(dumps(record) + b"\n" for record in records))
+                stream.flush()
+                self.written += len(records)
+            except (OSError, TypeError, ValueError):
+                self.write_errors += 1
+            if stop:
+                return
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "sampled_out": self.sampled_out,
+            "write_errors": self.write_errors,
+        }
+
+
+def open_log_stream() -> BinaryIO:
+    if settings.LOG_FILE:
+        return open(settings.LOG_FILE, "ab")
+    return sys.stdout.buffer
+
+
+class AccessLogMiddleware:
+    """
+    ASGI middleware logging one structured record per HTTP request. Server
+    errors are always logged; other requests are sampled.
+    """
+
+    def __init__(self, app, log: StructuredLog, sample_rate: float = 1.0):
+        self.app = app
+        self.log = log
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            client = scope.get("client")
+            self.log.log(
+                {
+                    "type": "access",
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": getattr(scope.get("route"), "path", None),
+                    "status": status_code,
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+                    "client": client[0] if client else None,
+                },
+                1.0 if status_code >= 500 else self.sample_rate,
+            )
+
+
+structured_log = StructuredLog(settings.LOG_QUEUE_SIZE)
+
+
+def log_upstream(
+    endpoint: str,
+    status: str,
+    duration: float,
+    failed: bool,
+) -> None:
+    """Log one upstream call. Failed calls are always logged."""
+    if not settings.LOG_ENABLED:
+        return
+    structured_log.log(
+        {
+            "type": "upstream",
+            "endpoint": endpoint,
+            "status": status,
+            "duration_ms": round(duration * 1000, 3),
+        },
+        1.0 if failed else settings.LOG_UPSTREAM_SAMPLE_RATE,
+    )
@@ -0,0 +1,229 @@
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+from starlette.routing import NoMatchFound
+
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+REGISTRY: List["Metric"] = []
+COLLECTORS: List[Callable[[], Iterable[str]]] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """
+    Minimal Prometheus-style metric. Label values are passed positionally in
+    `labelnames` order and each series is a plain dict entry, so recording a
+    sample is a dict lookup and an add.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        REGISTRY.append(self)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        yield from self.samples()
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in self._values.items():
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+
+class Histogram(Metric):
+    """Fixed-bucket histogram. Bucket counts are cumulated only when rendered."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # Per series: one count per bucket plus +Inf, then sum.
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self) -> Iterable[str]:
+        bounds = self.buckets + (float("inf"),)
+        for labels, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(bounds, series):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                yield (
+                    f"{self.name}_bucket"
+                    f"{_labels(self.labelnames, labels, le)} {cumulative}"
+                )
+            label_set = _labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_set} {_number(series[-1])}"
+            yield f"{self.name}_count{label_set} {cumulative}"
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    for collector in COLLECTORS:
+        lines.extend(collector())
+    return "\n".join(lines) + "\n"
+
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests by route and status.",
+    ("route", "method", "status"),
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "End-to-end request latency.", ("route",)
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Requests currently being served."
+)
+UPSTREAM_REQUESTS = Counter(
+    "upstream_requests_total",
+    "Upstream calls by endpoint and outcome.",
+    ("endpoint", "status"),
+)
+UPSTREAM_REQUEST_DURATION = Histogram(
+    "upstream_request_duration_seconds", "Upstream call latency.", ("endpoint",)
+)
+UPSTREAM_REQUESTS_IN_FLIGHT = Gauge(
+    "upstream_requests_in_flight", "Upstream calls currently in flight.", ("endpoint",)
+)
+
+
+def stats_collector(
+    prefix: str, stats: Callable[[], dict]
+) -> Callable[[], Iterable[str]]:
+    """Expose the numeric fields of a component's `stats()` dict as gauges."""
+
+    def collect() -> Iterable[str]:
+        for key, value in stats().items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                yield f"# TYPE {prefix}_{key} gauge"
+                yield f"{prefix}_{key} {_number(value)}"
+
+    return collect
+
+
+def route_label(scope) -> str:
+    """
+    Full route template of a request, e.g. `/app/v1/inline/hotel-list`.
+
+    FastAPI keeps the template of a route relative to the router that
+    declared it, without the prefixes it was included under. Those are
+    whatever the request path has in front of the part the route matched.
+    """
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    try:
+        matched = route.url_path_for(route.name, **scope.get("path_params", {}))
+    except NoMatchFound:
+        return route.path
+    path, root_path = scope["path"], scope.get("root_path", "")
+    # Servers differ in whether the path includes the root path.
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path) :]
+    if not path.endswith(matched):
+        return route.path
+    return path[: len(path) - len(matched)] + route.path
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request counts, statuses and latency per route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            # Label by route template, never the raw path, to bound cardinality.
+            path = route_label(scope)
+            HTTP_REQUESTS.inc(path, scope["method"], str(status_code))
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, path)
@@ -0,0 +1,182 @@
+import os
+import re
+from datetime import date, datetime, timedelta, timezone
+from typing import FrozenSet, Iterable, NoReturn, Optional
+from fastapi import HTTPException
+from pydantic import BaseModel
+from app.core.config import settings
+from app.core.targets import UpstreamTarget
+
+AIRPORT_CODES_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "data",
+    "iata_codes.txt",
+)
+
+# Only the extended YYYY-MM-DD form; date.fromisoformat alone also accepts
+# basic (20300110) and ISO week (2030-W01-1) dates.
+DATE_FORMAT = re.compile(r"[0-9]{4}-[0-9]{2}-[0-9]{2}")
+
+
+class CodeIndex:
+    """
+    Set of three-letter IATA codes stored as a bitmap with one bit per
+    possible code (26 ** 3 bits, about 2 KB). Lookups are case-insensitive.
+    """
+
+    __slots__ = ("_bits", "size")
+
+    def __init__(self, codes: Iterable[str]):
+        self._bits = bytearray((26**3 + 7) // 8)
+        self.size = 0
+        for code in codes:
+            slot = _slot(code)
+            if slot is None:
+                raise ValueError(f"Invalid IATA code: {code!r}")
+            if not self._bits[slot >> 3] & (1 << (slot & 7)):
+                self._bits[slot >> 3] |= 1 << (slot & 7)
+                self.size += 1
+
+    def __contains__(self, code: str) -> bool:
+        slot = _slot(code)
+        return slot is not None and bool(self._bits[slot >> 3] & (1 << (slot & 7)))
+
+    def __len__(self) -> int:
+        return self.size
+
+
+def _slot(code: str) -> Optional[int]:
+    if len(code) != 3 or not code.isascii() or not code.isalpha():
+        return None
+    a, b, c = code.upper().encode("ascii")
+    return ((a - 65) * 26 + (b - 65)) * 26 + (c - 65)
+
+
+def _read_identifiers(path: str) -> Iterable[str]:
+    """Whitespace-separated identifiers; lines starting with `#` are skipped."""
+    with open(path, encoding="utf-8") as lines:
+        for line in lines:
+            if not line.startswith("#"):
+                yield from line.split()
+
+
+class QueryValidator:
+    """
+    Local checks run on ad queries before they are sent upstream: dates are
+    real `YYYY-MM-DD` dates, not in the past and in order, and airport and
+    city identifiers are known. Failing queries are rejected with a 422.
+
+    Dates are compared with today in UTC minus `past_slack_days`, so clients
+    in time zones behind UTC are not rejected around midnight. City ids are
+    only checked when an index of them is configured.
+    """
+
+    def __init__(
+        self,
+        airports: CodeIndex,
+        cities: Optional[FrozenSet[str]],
+        past_slack_days: int,
+    ):
+        self.airports = airports
+        self.cities = cities
+        self.past_slack_days = past_slack_days
+        self.validated = 0
+        self.rejected = 0
+
+    def validate(self, target: UpstreamTarget, payload: BaseModel) -> None:
+        earliest = datetime.now(timezone.utc).date() - timedelta(
+            days=self.past_slack_days
+        )
+        try:
+            if target.vertical == "hotel":
+                self._hotel(payload, earliest)
+            elif target.vertical == "flight":
+                self._flight(payload, earliest)
+            elif target.vertical == "car":
+                self._car(payload, earliest)
+        except HTTPException:
+            self.rejected += 1
+            raise
+        self.validated += 1
+
+    def _hotel(self, payload: BaseModel, earliest: date) -> None:
+        if self.cities is not None and payload.cityId not in self.cities:
+            _reject(f"Unknown cityId: {payload.cityId}")
+        checkin = _date("checkinDate", payload.checkinDate, earliest)
+        checkout = _date("checkoutDate", payload.checkoutDate, earliest)
+        if checkout <= checkin:
+            _reject("checkoutDate must be after checkinDate")
+
+    def _flight(self, payload: BaseModel, earliest: date) -> None:
+        if not payload.legs:
+            _reject("At least one flight leg is required")
+        previous = earliest
+        for index, leg in enumerate(payload.legs):
+            field = f"legs[{index}]"
+            self._airport(f"{field}.originAirport", leg.originAirport)
+            self._airport(f"{field}.destinationAirport", leg.destinationAirport)
+            if leg.originAirport.upper() == leg.destinationAirport.upper():
+                _reject(f"{field}: originAirport and destinationAirport are equal")
+            leg_date = _date(f"{field}.date", leg.date, earliest)
+            if leg_date < previous:
+                _reject(f"{field}.date is before the previous leg")
+            previous = leg_date
+
+    def _car(self, payload: BaseModel, earliest: date) -> None:
+        self._location("pickUpLocation", payload.pickUpLocation)
+        if payload.dropOffLocation is not None:
+            self._location("dropOffLocation", payload.dropOffLocation)
+        pick_up = _date("pickUpDate", payload.pickUpDate, earliest)
+        drop_off = _date("dropOffDate", payload.dropOffDate, earliest)
+        if drop_off < pick_up:
+            _reject("dropOffDate must not be before pickUpDate")
+
+    def _location(self, field: str, location: BaseModel) -> None:
+        if location.type == "airport":
+            self._airport(f"{field}.locationQuery", location.locationQuery)
+        elif location.type == "city" and self.cities is not None:
+            if location.locationQuery not in self.cities:
+                _reject(f"Unknown city in {field}: {location.locationQuery}")
+
+    def _airport(self, field: str, code: str) -> None:
+        if code not in self.airports:
+            _reject(f"Unknown airport code in {field}: {code}")
+
+    def stats(self) -> dict:
+        return {
+            "airports": len(self.airports),
+            "cities": len(self.cities) if self.cities is not None else None,
+            "validated": self.validated,
+            "rejected": self.rejected,
+        }
+
+
+def _reject(detail: str) -> NoReturn:
+    raise HTTPException(status_code=422, detail=detail)
+
+
+def _date(field: str, value: str, earliest: date) -> date:
+    try:
+        if not DATE_FORMAT.fullmatch(value):
+            raise ValueError
+        parsed = date.fromisoformat(value)
+    except ValueError:
+        _reject(f"{field} is not a YYYY-MM-DD date: {value}")
+    if parsed < earliest:
+        _reject(f"{field} is in the past: {value}")
+    return parsed
+
+
+def create_query_validator() -> QueryValidator:
+    airports = CodeIndex(
+        _read_identifiers(
+            settings.PREVALIDATION_AIRPORT_CODES_FILE or AIRPORT_CODES_FILE
+        )
+    )
+    cities = None
+    if settings.PREVALIDATION_CITY_IDS_FILE:
+        cities = frozenset(_read_identifiers(settings.PREVALIDATION_CITY_IDS_FILE))
+    return QueryValidator(airports, cities, settings.PREVALIDATION_PAST_SLACK_DAYS)
+
+
+query_validator = create_query_validator()
@@ -0,0 +1,88 @@
+import asyncio
+import cProfile
+import os
+import random
+import time
+from app.core.config import settings
+
+
+class RequestProfiler:
+    """
+    Sampled cProfile capture of slow requests.
+
+    A sampled request runs under cProfile and, if it takes at least
+    `threshold` seconds, its profile is written to `directory` as a pstats
+    file (`python -m pstats <file>` or snakeviz to read it). Only one request
+    is profiled at a time. The profiler sees the whole event loop thread, so
+    a profile also includes whatever other requests ran in the meantime.
+    """
+
+    def __init__(self, directory: str, sample_rate: float, threshold: float):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.active = False
+        self.profiled = 0
+        self.written = 0
+        self.write_errors = 0
+
+    def should_profile(self) -> bool:
+        return not self.active and random.random() < self.sample_rate
+
+    def _write(self, profiler: cProfile.Profile, path: str) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        profiler.dump_stats(path)
+
+    async def save(self, profiler: cProfile.Profile, path: str, elapsed: float):
+        self.profiled += 1
+        if elapsed < self.threshold:
+            return
+        name = path.strip("/").replace("/", "_") or "root"
+        filename = (
+            f"{time.strftime('%Y%m%dT%H%M%S')}-{elapsed * 1000:.0f}ms-{name}.prof"
+        )
+        try:
+            await asyncio.to_thread(
+                self._write, profiler, os.path.join(self.directory, filename)
+            )
+        except OSError:
+            self.write_errors += 1
+            return
+        self.written += 1
+
+    def stats(self) -> dict:
+        return {
+            "profiled": self.profiled,
+            "written": self.written,
+            "write_errors": self.write_errors,
+        }
+
+
+class ProfilingMiddleware:
+    """ASGI middleware running sampled requests under the request profiler."""
+
+    def __init__(self, app, profiler: RequestProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.profiler.should_profile():
+            await self.app(scope, receive, send)
+            return
+
+        self.profiler.active = True
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.disable()
+            self.profiler.active = False
+            elapsed = time.perf_counter() - started
+            await self.profiler.save(profiler, scope["path"], elapsed)
+
+
+request_profiler = RequestProfiler(
+    settings.PROFILE_DIR, settings.PROFILE_SAMPLE_RATE, settings.PROFILE_THRESHOLD
+)
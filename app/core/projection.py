@@ -0,0 +1,82 @@
+from functools import lru_cache
+from typing import Any, Iterable, Optional
+from fastapi import HTTPException, Query
+from app.core.config import settings
+
+
+class Projection:
+    """
+    Set of dotted paths (e.g. `ads.price.localizedPrice`) to keep from an
+    upstream ad response, compiled once into a nested tree.
+
+    Lists are traversed transparently, so `ads.logoUrl` keeps `logoUrl` on
+    every ad. Paths missing from the response are skipped. `name` is set
+    for named views only; only those are cached with the response.
+    """
+
+    __slots__ = ("name", "tree")
+
+    def __init__(self, paths: Iterable[str], name: Optional[str] = None):
+        self.name = name
+        self.tree: dict = {}
+        for path in paths:
+            *parents, leaf = path.split(".")
+            node = self.tree
+            for part in parents:
+                child = node.setdefault(part, {})
+                if child is True:
+                    break
+                node = child
+            else:
+                node[leaf] = True
+
+    def apply(self, value: Any) -> Any:
+        return _project(value, self.tree)
+
+
+def _project(value: Any, tree: dict) -> Any:
+    if isinstance(value, list):
+        return [_project(item, tree) for item in value]
+    if not isinstance(value, dict):
+        return value
+    projected = {}
+    for name, subtree in tree.items():
+        if name in value:
+            item = value[name]
+            projected[name] = item if subtree is True else _project(item, subtree)
+    return projected
+
+
+VIEWS = {
+    name: Projection(paths, name) for name, paths in settings.PROJECTION_VIEWS.items()
+}
+
+
+@lru_cache(maxsize=256)
+def _fields_projection(fields: str) -> Projection:
+    paths = [path.strip() for path in fields.split(",") if path.strip()]
+    if len(paths) > settings.PROJECTION_MAX_FIELDS:
+        raise HTTPException(status_code=400, detail="Too many fields requested")
+    return Projection(paths)
+
+
+def response_projection(
+    fields: Optional[str] = Query(
+        None,
+        description="Comma-separated dotted paths to keep from the upstream "
+        "response, e.g. `ads.logoUrl,ads.price,ads.deepLink`.",
+    ),
+    view: Optional[str] = Query(
+        None, description="Named field projection configured on the server."
+    ),
+) -> Optional[Projection]:
+    """Dependency resolving the `fields` / `view` query parameters."""
+    if view is not None:
+        if view not in VIEWS:
+            raise HTTPException(status_code=400, detail=f"Unknown view: {view}")
+        if fields is None:
+            return VIEWS[view]
+        fields = ",".join([fields, *settings.PROJECTION_VIEWS[view]])
+    if not fields:
+        return None
+    return _fields_projection(fields)
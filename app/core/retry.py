@@ -0,0 +1,98 @@
+import random
+from typing import Sequence
+import httpx
+from app.core.config import settings
+
+# Transport errors worth another attempt. Read and protocol errors can come
+# after the upstream has processed the POST; it is retried anyway because ad
+# queries are idempotent reads.
+RETRYABLE_ERRORS = (
+    httpx.ConnectError,
+    httpx.ConnectTimeout,
+    httpx.PoolTimeout,
+    httpx.ReadError,
+    httpx.WriteError,
+    httpx.RemoteProtocolError,
+)
+
+
+class RetryBudget:
+    """
+    Token bucket capping extra upstream attempts (retries, hedges) to a
+    fraction of requests.
+
+    Every first attempt deposits `ratio` tokens and every extra attempt
+    spends one, so extra attempts stay under `ratio` of the traffic however
+    many upstreams are failing. The bucket holds at most `max_tokens`, which
+    also allows a few extra attempts at low traffic.
+    """
+
+    def __init__(self, ratio: float, max_tokens: float):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+
+    def deposit(self) -> None:
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class RetryPolicy:
+    """
+    Which upstream failures are retried, how often and after how long.
+
+    Backoff is exponential with full jitter: the n-th retry waits a random
+    time between 0 and `backoff_base * 2 ** (n - 1)`, capped at
+    `backoff_max`.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int,
+        statuses: Sequence[int],
+        backoff_base: float,
+        backoff_max: float,
+        budget: RetryBudget,
+    ):
+        self.max_attempts = max_attempts
+        self.statuses = frozenset(statuses)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.budget = budget
+        self.retries = 0
+        self.budget_exhausted = 0
+
+    def should_retry(self, attempt: int) -> bool:
+        """Whether attempt number `attempt` (1-based) may be followed by another."""
+        if attempt >= self.max_attempts:
+            return False
+        if not self.budget.withdraw():
+            self.budget_exhausted += 1
+            return False
+        self.retries += 1
+        return True
+
+    def backoff(self, attempt: int) -> float:
+        ceiling = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+        return random.uniform(0, ceiling)
+
+    def stats(self) -> dict:
+        return {
+            "retries": self.retries,
+            "budget_exhausted": self.budget_exhausted,
+            "budget_tokens": round(self.budget.tokens, 2),
+        }
+
+
+retry_policy = RetryPolicy(
+    settings.RETRY_MAX_ATTEMPTS,
+    settings.RETRY_STATUSES,
+    settings.RETRY_BACKOFF_BASE,
+    settings.RETRY_BACKOFF_MAX,
+    RetryBudget(settings.RETRY_BUDGET_RATIO, settings.RETRY_BUDGET_MAX_TOKENS),
+)
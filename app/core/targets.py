@@ -0,0 +1,138 @@
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+import httpx
+from pydantic import BaseModel
+from app.core.config import settings
+from app.core.http import UPSTREAM_TIMEOUTS, cookie_header
+from app.utils.constants import constants
+
+# Request fields that go into query params or headers, never the upstream body.
+UPSTREAM_BODY_EXCLUDE = frozenset({"userTrackId", "clientIP", "cookies", "userAgent"})
+
+STATIC_HEADERS = {"Content-Type": "application/json"}
+
+
+@dataclass(frozen=True)
+class UpstreamTarget:
+    """
+    One affiliate API endpoint, built once at import time.
+
+    Everything that does not depend on the request (URL, API key param,
+    static headers, cache TTL, timeouts and the field projection used for the
+    upstream body) is computed here instead of on every call.
+
+    `include` lists the only fields sent upstream; when unset, every field
+    the client set is sent except `UPSTREAM_BODY_EXCLUDE`. The body is
+    serialized by pydantic-core straight to JSON bytes, skipping the
+    intermediate dict and the stdlib encoder.
+    """
+
+    name: str
+    product: str
+    vertical: str
+    url: str
+    api_key: str
+    ttl: float
+    timeout: httpx.Timeout
+    include: Optional[Tuple[str, ...]] = None
+    dump_kwargs: dict = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        if self.include is not None:
+            dump_kwargs = {"include": set(self.include)}
+        else:
+            dump_kwargs = {"exclude": set(UPSTREAM_BODY_EXCLUDE), "exclude_unset": True}
+        object.__setattr__(self, "dump_kwargs", dump_kwargs)
+
+    def params(self, payload: BaseModel) -> dict:
+        return {"apiKey": self.api_key, "userTrackId": payload.userTrackId}
+
+    def headers(self, payload: BaseModel, cookies: dict) -> dict:
+        headers = {**STATIC_HEADERS, **cookie_header(cookies)}
+        # httpx rejects None header values; leave out fields sent as null.
+        if payload.userAgent is not None:
+            headers["User-Agent"] = payload.userAgent
+        if payload.clientIP is not None:
+            headers["x-original-client-ip"] = payload.clientIP
+        return headers
+
+    def body(self, payload: BaseModel) -> bytes:
+        return payload.model_dump_json(**self.dump_kwargs).encode("utf-8")
+
+
+def _target(
+    product: str,
+    vertical: str,
+    base_url: str,
+    endpoint: str,
+    api_key: str,
+    ttl: float,
+    include: Optional[Tuple[str, ...]] = None,
+) -> UpstreamTarget:
+    return UpstreamTarget(
+        name=f"{product}/{vertical}",
+        product=product,
+        vertical=vertical,
+        url=base_url + endpoint,
+        api_key=api_key,
+        ttl=ttl,
+        timeout=UPSTREAM_TIMEOUTS[vertical],
+        include=include,
+    )
+
+
+TARGETS: Dict[Tuple[str, str], UpstreamTarget] = {
+    (target.product, target.vertical): target
+    for target in (
+        _target(
+            "inline",
+            "hotel",
+            constants.BASE_URL_INLINE,
+            constants.HOTEL_LIST_ENDPOINT,
+            settings.INLINE_ADS_API_KEY,
+            settings.CACHE_TTL_HOTEL,
+        ),
+        _target(
+            "inline",
+            "flight",
+            constants.BASE_URL_INLINE,
+            constants.FLIGHT_LIST_ENDPOINT,
+            settings.INLINE_ADS_API_KEY,
+            settings.CACHE_TTL_FLIGHT,
+        ),
+        _target(
+            "inline",
+            "car",
+            constants.BASE_URL_INLINE,
+            constants.CAR_LIST_ENDPOINT,
+            settings.INLINE_ADS_API_KEY,
+            settings.CACHE_TTL_CAR,
+        ),
+        _target(
+            "compareTo",
+            "hotel",
+            constants.BASE_URL_COMPARETO,
+            constants.HOTEL_LIST_ENDPOINT,
+            settings.COMPARETO_ADS_API_KEY,
+            settings.CACHE_TTL_HOTEL,
+            # The compareTo hotel endpoint only takes these fields.
+            include=("showOn", "checkinDate", "checkoutDate", "cityId"),
+        ),
+        _target(
+            "compareTo",
+            "flight",
+            constants.BASE_URL_COMPARETO,
+            constants.FLIGHT_LIST_ENDPOINT,
+            settings.COMPARETO_ADS_API_KEY,
+            settings.CACHE_TTL_FLIGHT,
+        ),
+        _target(
+            "compareTo",
+            "car",
+            constants.BASE_URL_COMPARETO,
+            constants.CAR_LIST_ENDPOINT,
+            settings.COMPARETO_ADS_API_KEY,
+            settings.CACHE_TTL_CAR,
+        ),
+    )
+}
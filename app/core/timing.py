@@ -0,0 +1,130 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional
+from starlette.datastructures import MutableHeaders
+
+
+class Timings:
+    """
+    Durations of the phases of one request, in seconds, summed per phase.
+    `checkpoint` is where the next `mark` interval starts.
+    """
+
+    __slots__ = ("started", "checkpoint", "phases")
+
+    def __init__(self):
+        self.started = self.checkpoint = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        total = time.perf_counter() - self.started
+        metrics = [
+            f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.phases.items()
+        ]
+        metrics.append(f"total;dur={total * 1000:.3f}")
+        return ", ".join(metrics)
+
+
+_timings: ContextVar[Optional[Timings]] = ContextVar("timings", default=None)
+
+
+def current_timings() -> Optional[Timings]:
+    return _timings.get()
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Time the enclosed block as `name` when the request is being timed."""
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+def mark(name: str) -> None:
+    """Record the time from the last checkpoint until now as `name`, once."""
+    timings = _timings.get()
+    if timings is not None and name not in timings.phases:
+        timings.add(name, time.perf_counter() - timings.checkpoint)
+
+
+def checkpoint() -> None:
+    """Start the next `mark` interval now, e.g. once a request leaves a queue."""
+    timings = _timings.get()
+    if timings is not None:
+        timings.checkpoint = time.perf_counter()
+
+
+# httpcore trace events timed as upstream phases.
+_TRACE_PHASES = {
+    "connection.connect_tcp": "upstream_connect",
+    "connection.start_tls": "upstream_tls",
+    "http11.receive_response_body": "upstream_body",
+    "http2.receive_response_body": "upstream_body",
+}
+_SEND_HEADERS = {"http11.send_request_headers", "http2.send_request_headers"}
+_RECEIVE_HEADERS = {"http11.receive_response_headers", "http2.receive_response_headers"}
+
+
+def upstream_trace(
+    timings: Timings,
+) -> Callable[[str, Dict[str, Any]], Awaitable[None]]:
+    """
+    httpx `trace` extension recording connect, TLS, time to first byte and
+    body download of an upstream call.
+    """
+    started: Dict[str, float] = {}
+
+    async def trace(event: str, info: Dict[str, Any]) -> None:
+        stage, _, state = event.rpartition(".")
+        now = time.perf_counter()
+        if state == "started":
+            started[stage] = now
+            return
+        if stage in _RECEIVE_HEADERS:
+            for sent in _SEND_HEADERS:
+                if sent in started:
+                    timings.add("upstream_ttfb", now - started.pop(sent))
+        elif stage in _TRACE_PHASES and stage in started:
+            timings.add(_TRACE_PHASES[stage], now - started.pop(stage))
+
+    return trace
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware timing the phases of each request and reporting them in
+    a `Server-Timing` response header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = Timings()
+        token = _timings.set(timings)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=list(message["headers"]))
+                headers.append("Server-Timing", timings.server_timing())
+                message = {**message, "headers": headers.raw}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _timings.reset(token)
@@ -0,0 +1,484 @@
+import asyncio
+import time
+from typing import Any, Dict, Optional
+import httpx
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+from app.core.breaker import CLOSED, circuit_breakers, is_failure_status
+from pydantic import BaseModel
+from app.core.bulkhead import bulkheads
+from app.core.cache import cache_key, response_cache
+from app.core.compression import response_compressor
+from app.core.config import settings
+from app.core.hedging import hedger
+from app.core.http import response_cookies
+from app.core.limiter import OVERLOAD_STATUSES, AdaptiveLimiter, adaptive_limiters
+from app.core.logs import log_upstream
+from app.core.projection import Projection
+from app.core.prevalidation import query_validator
+from app.core.metrics import (
+    UPSTREAM_REQUEST_DURATION,
+    UPSTREAM_REQUESTS,
+    UPSTREAM_REQUESTS_IN_FLIGHT,
+)
+from app.core.retry import RETRYABLE_ERRORS, retry_policy
+from app.core.singleflight import upstream_flights
+from app.core.targets import UpstreamTarget
+from app.core.timing import Timings, current_timings, mark, phase, upstream_trace
+from app.core.warmer import cache_warmer
+from app.utils.responses import FastJSONResponse, dumps, loads
+
+
+class UpstreamResponse:
+    """Upstream ad response detached from the HTTP client, safe to cache."""
+
+    __slots__ = (
+        "status_code",
+        "content",
+        "cookies",
+        "is_json",
+        "cached",
+        "stale",
+        "variants",
+    )
+
+    def __init__(
+        self,
+        status_code: int,
+        content: bytes,
+        cookies: Optional[dict] = None,
+        is_json: bool = True,
+        cached: bool = False,
+        stale: bool = False,
+        variants: Optional[dict] = None,
+    ):
+        self.status_code = status_code
+        self.content = content
+        self.cookies = cookies or {}
+        self.is_json = is_json
+        self.cached = cached
+        self.stale = stale
+        # Encoded envelopes shared with the cache entry, if any.
+        self.variants = variants
+
+    def json(self) -> Any:
+        """
+        Parsed body. Bodies that are not valid JSON, such as HTML error pages
+        from a proxy, are returned as text instead of raising.
+        """
+        if self.is_json:
+            try:
+                with phase("parse"):
+                    return loads(self.content)
+            except ValueError:
+                pass
+        return self.content.decode("utf-8", errors="replace") or None
+
+
+async def call_upstream(
+    client: httpx.AsyncClient,
+    target: UpstreamTarget,
+    payload: BaseModel,
+    key: str,
+    cookies: dict,
+) -> UpstreamResponse:
+    """
+    Send one ad query to the affiliate API, bypassing the cache read, and
+    record the outcome in the target's circuit breaker, adaptive concurrency
+    limit, the metrics and the response cache.
+
+    The call runs inside the target's bulkhead and fails with 503 when the
+    target's concurrency budget is exhausted.
+
+    Retryable statuses and connection errors are retried with backoff while
+    the circuit is closed and the global retry budget allows it.
+    """
+    bulkhead = bulkheads.get(target.name)
+    breaker = circuit_breakers.get(target.name)
+    await bulkhead.acquire()
+    started = time.monotonic()
+    try:
+        response = await _retry_upstream(client, target, payload, key, cookies)
+    except httpx.HTTPError:
+        breaker.record_failure(started)
+        raise
+    finally:
+        bulkhead.release()
+    # One breaker outcome per request, however many attempts it took.
+    if is_failure_status(response.status_code):
+        breaker.record_failure(started)
+    else:
+        breaker.record_success(started)
+    return response
+
+
+async def _retry_upstream(
+    client: httpx.AsyncClient,
+    target: UpstreamTarget,
+    payload: BaseModel,
+    key: str,
+    cookies: dict,
+) -> UpstreamResponse:
+    if not settings.RETRY_ENABLED:
+        return await _call_upstream(client, target, payload, key, cookies)
+    retry_policy.budget.deposit()
+    breaker = circuit_breakers.get(target.name)
+    attempt = 1
+    while True:
+        try:
+            response = await _call_upstream(client, target, payload, key, cookies)
+        except RETRYABLE_ERRORS:
+            if breaker.state != CLOSED or not retry_policy.should_retry(attempt):
+                raise
+        else:
+            if (
+                response.status_code not in retry_policy.statuses
+                or breaker.state != CLOSED
+                or not retry_policy.should_retry(attempt)
+            ):
+                return response
+        await asyncio.sleep(retry_policy.backoff(attempt))
+        attempt += 1
+
+
+async def _call_upstream(
+    client: httpx.AsyncClient,
+    target: UpstreamTarget,
+    payload: BaseModel,
+    key: str,
+    cookies: dict,
+) -> UpstreamResponse:
+    limiter = None
+    if settings.ADAPTIVE_LIMIT_ENABLED:
+        limiter = adaptive_limiters.get(target.name)
+    timings = current_timings()
+    with phase("request_body"):
+        content = target.body(payload)
+
+    async def attempt(hedge: bool) -> Optional[httpx.Response]:
+        if not hedge:
+            if limiter is not None:
+                await limiter.acquire()
+            return await _send(
+                client, target, payload, content, cookies, limiter, timings
+            )
+        # Hedges take a bulkhead and concurrency slot of their own, and are
+        # not sent if none is free right away.
+        bulkhead = bulkheads.get(target.name)
+        if not await bulkhead.try_acquire():
+            return None
+        try:
+            if limiter is not None and not limiter.try_acquire():
+                return None
+            return await _send(client, target, payload, content, cookies, limiter, None)
+        finally:
+            bulkhead.release()
+
+    with phase("upstream"):
+        response = await hedger.send(target.name, attempt)
+    is_json = "json" in response.headers.get("content-type", "") and _is_valid_json(
+        response.content
+    )
+    entry = None
+    ttl = cache_ttl(target, response.status_code)
+    if settings.CACHE_ENABLED and is_json and ttl is not None:
+        entry = response_cache.set(key, response.status_code, response.content, ttl)
+    return UpstreamResponse(
+        response.status_code,
+        response.content,
+        response_cookies(response),
+        is_json=is_json,
+        variants=entry.variants if entry is not None else None,
+    )
+
+
+def _is_valid_json(content: bytes) -> bool:
+    """
+    Whether a body labelled JSON really is JSON. Checked once per upstream
+    response, before it is cached, so pass-through envelopes never splice in
+    a truncated body; invalid ones take the text path and are not cached.
+    """
+    try:
+        with phase("parse"):
+            loads(content)
+    except ValueError:
+        return False
+    return True
+
+
+async def _send(
+    client: httpx.AsyncClient,
+    target: UpstreamTarget,
+    payload: BaseModel,
+    content: bytes,
+    cookies: dict,
+    limiter: Optional[AdaptiveLimiter],
+    timings: Optional[Timings],
+) -> httpx.Response:
+    """
+    One upstream HTTP request, recorded in the metrics and the upstream log.
+    The caller holds a slot of `limiter`, which is released here.
+    """
+    UPSTREAM_REQUESTS_IN_FLIGHT.inc(target.name)
+    started = time.perf_counter()
+    dropped = None
+    try:
+        response = await client.post(
+            target.url,
+            params=target.params(payload),
+            headers=target.headers(payload, cookies),
+            content=content,
+            timeout=target.timeout,
+            extensions=(
+                {"trace": upstream_trace(timings)} if timings is not None else None
+            ),
+        )
+        dropped = response.status_code in OVERLOAD_STATUSES
+    except httpx.HTTPError as exc:
+        dropped = True
+        UPSTREAM_REQUESTS.inc(target.name, type(exc).__name__)
+        log_upstream(
+            target.name, type(exc).__name__, time.perf_counter() - started, True
+        )
+        raise
+    except asyncio.CancelledError:
+        # E.g. the slower of a hedged pair.
+        UPSTREAM_REQUESTS.inc(target.name, "cancelled")
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        UPSTREAM_REQUESTS_IN_FLIGHT.dec(target.name)
+        UPSTREAM_REQUEST_DURATION.observe(elapsed, target.name)
+        if limiter is not None:
+            limiter.release(elapsed, dropped)
+    UPSTREAM_REQUESTS.inc(target.name, str(response.status_code))
+    log_upstream(
+        target.name,
+        str(response.status_code),
+        elapsed,
+        is_failure_status(response.status_code),
+    )
+    return response
+
+
+def cache_ttl(target: UpstreamTarget, status_code: int) -> Optional[float]:
+    """
+    Cache TTL for an upstream JSON response, or None if it is not cached.
+    Client errors such as an unknown identifier are cached for the negative
+    TTL, so repeating the query does not reach the upstream again.
+    """
+    if status_code == 200:
+        return target.ttl
+    if status_code in settings.CACHE_NEGATIVE_STATUSES:
+        return settings.CACHE_NEGATIVE_TTL
+    return None
+
+
+async def fetch_upstream(
+    request: Request, target: UpstreamTarget, payload: BaseModel
+) -> UpstreamResponse:
+    """
+    POST an ad query to an affiliate API target, serving repeated queries from the
+    response cache and collapsing identical concurrent queries into a single
+    upstream call.
+
+    Queries failing local pre-validation are rejected with 422 before any
+    upstream call. Successful responses and client errors are cached (see
+    `cache_ttl`). Cached hits and collapsed callers carry no cookies.
+    Upstream timeouts and an exceeded request deadline are reported as 504,
+    other transport errors as 502.
+
+    While the endpoint's circuit breaker is open, the last good cached
+    response is served marked as stale, or the call fails fast with 503.
+    """
+    mark("decode")
+    if settings.PREVALIDATION_ENABLED:
+        with phase("validate"):
+            query_validator.validate(target, payload)
+    key = cache_key(target, payload)
+    if settings.CACHE_ENABLED:
+        with phase("cache"):
+            entry = await response_cache.get(key)
+        # Queries answered with a cached client error are not worth warming.
+        if settings.WARMER_ENABLED and (entry is None or entry.status_code == 200):
+            cache_warmer.record(target, key, payload)
+        if entry is not None:
+            return UpstreamResponse(
+                entry.status_code, entry.content, cached=True, variants=entry.variants
+            )
+
+    breaker = circuit_breakers.get(target.name)
+    if not breaker.allow():
+        entry = await response_cache.get_stale(key, settings.CIRCUIT_STALE_MAX_AGE)
+        # Negative-cached client errors are not a good response to fall back on.
+        if entry is not None and entry.status_code == 200:
+            return UpstreamResponse(
+                entry.status_code, entry.content, cached=True, stale=True
+            )
+        raise HTTPException(status_code=503, detail="Upstream circuit open")
+
+    async def call() -> UpstreamResponse:
+        return await call_upstream(
+            request.app.state.http_clients[target.name],
+            target,
+            payload,
+            key,
+            request.cookies,
+        )
+
+    async def collapsed_call() -> UpstreamResponse:
+        if not settings.SINGLE_FLIGHT_ENABLED:
+            return await call()
+        result, shared = await upstream_flights.do(key, call)
+        if shared:
+            # Cookies belong to the user whose request went upstream.
+            return UpstreamResponse(
+                result.status_code,
+                result.content,
+                is_json=result.is_json,
+                variants=result.variants,
+            )
+        return result
+
+    try:
+        with phase("fetch"):
+            return await asyncio.wait_for(collapsed_call(), request_deadline(request))
+    except (asyncio.TimeoutError, httpx.TimeoutException):
+        raise HTTPException(status_code=504, detail="Upstream request timed out")
+    except httpx.HTTPError:
+        raise HTTPException(status_code=502, detail="Upstream request failed")
+
+
+async def refresh_upstream(
+    clients: Dict[str, httpx.AsyncClient],
+    target: UpstreamTarget,
+    payload: BaseModel,
+    key: str,
+) -> UpstreamResponse:
+    """
+    Re-fetch a cached query on behalf of the cache warmer. The tracking id,
+    client IP and user agent of the user whose query was recorded are
+    replaced with the warmer's own, and no user cookies are sent.
+    """
+    payload = payload.model_copy(
+        update={
+            "userTrackId": settings.WARMER_USER_TRACK_ID,
+            "clientIP": settings.WARMER_CLIENT_IP,
+            "userAgent": settings.WARMER_USER_AGENT,
+            "cookies": None,
+        }
+    )
+    result, _ = await upstream_flights.do(
+        key, lambda: call_upstream(clients[target.name], target, payload, key, {})
+    )
+    return result
+
+
+def request_deadline(request: Request) -> Optional[float]:
+    """
+    Return the overall time budget for the upstream part of a request, in
+    seconds, from the `X-Request-Deadline-Ms` header or the configured default.
+    """
+    deadline = settings.REQUEST_DEADLINE_DEFAULT
+    header = request.headers.get("x-request-deadline-ms")
+    if header:
+        try:
+            deadline = float(header) / 1000
+        except ValueError:
+            pass
+    if deadline is None:
+        return None
+    return max(0.0, min(deadline, settings.REQUEST_DEADLINE_MAX))
+
+
+def passthrough_requested(request: Request) -> bool:
+    mode = request.headers.get("x-response-mode")
+    if mode == "parse":
+        return False
+    if mode == "passthrough":
+        return True
+    return settings.RESPONSE_PASSTHROUGH
+
+
+def _envelope(response: UpstreamResponse, projection: Optional[Projection]) -> bytes:
+    if projection is not None:
+        ads = dumps(projection.apply(response.json()))
+    else:
+        ads = response.content.strip() or b"null"
+    stale = b',"stale":true' if response.stale else b""
+    return b'{"status_code":%d,"response":%s%s}' % (response.status_code, ads, stale)
+
+
+def ads_response(
+    response: UpstreamResponse,
+    request: Request,
+    projection: Optional[Projection] = None,
+) -> Response:
+    """
+    Wrap an upstream response in the `{status_code, response}` envelope.
+
+    In pass-through mode the raw upstream JSON bytes are spliced into the
+    envelope without being parsed and re-serialized. Clients can pick the
+    mode per request with the `X-Response-Mode: parse|passthrough` header.
+    Non-JSON upstream bodies, including bodies labelled JSON that do not
+    parse, always take the parse path. Stale fallbacks are marked with
+    `"stale": true`.
+
+    A `projection` trims successful responses down to the requested fields.
+
+    Pass-through envelopes are compressed here rather than by the
+    compression middleware. For cached responses the compressed and the
+    view-projected envelopes are stored with the cache entry and reused by
+    later hits.
+    """
+    if not response.is_json or response.status_code != 200:
+        projection = None
+
+    if response.is_json and passthrough_requested(request):
+        encoding = None
+        if settings.COMPRESSION_ENABLED:
+            encoding = response_compressor.negotiate(
+                request.headers.get("accept-encoding")
+            )
+        variants = response.variants
+        if response.stale or (projection is not None and projection.name is None):
+            variants = None
+        variant = (projection.name if projection is not None else None, encoding)
+        cached = variants.get(variant) if variants is not None else None
+        if cached is None:
+            with phase("serialize"):
+                content = _envelope(response, projection)
+            if (
+                encoding is not None
+                and len(content) >= response_compressor.minimum_size
+            ):
+                with phase("compress"):
+                    content = response_compressor.compress(content, encoding)
+                cached = (content, encoding)
+            else:
+                cached = (content, None)
+            if variants is not None and variant != (None, None):
+                variants[variant] = cached
+        content, encoding = cached
+        headers = {}
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+            headers["Vary"] = "Accept-Encoding"
+        envelope = Response(
+            content=content, headers=headers, media_type="application/json"
+        )
+    else:
+        ads = response.json()
+        content = {
+            "status_code": response.status_code,
+            "response": projection.apply(ads) if projection is not None else ads,
+        }
+        if response.stale:
+            content["stale"] = True
+        with phase("serialize"):
+            envelope = FastJSONResponse(content=content)
+
+    for key, value in response.cookies.items():
+        envelope.set_cookie(key=key, value=value)
+
+    return envelope
@@ -0,0 +1,126 @@
+import asyncio
+from itertools import zip_longest
+from typing import Awaitable, Callable, Dict, List, Tuple
+from pydantic import BaseModel
+from app.core.breaker import CLOSED, circuit_breakers
+from app.core.cache import response_cache
+from app.core.config import settings
+from app.core.targets import UpstreamTarget
+
+Refresh = Callable[[UpstreamTarget, BaseModel, str], Awaitable[object]]
+
+
+class HeavyHitters:
+    """
+    Space-Saving top-k counter: tracks at most `capacity` keys, and when full
+    replaces the least-counted key, so frequent keys survive in bounded
+    memory. Each tracked key keeps the latest payload seen for it.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._counts: Dict[str, int] = {}
+        self._items: Dict[str, Tuple[UpstreamTarget, BaseModel]] = {}
+
+    def add(self, key: str, target: UpstreamTarget, payload: BaseModel) -> None:
+        count = self._counts.get(key)
+        if count is None and len(self._counts) >= self.capacity:
+            victim = min(self._counts, key=self._counts.__getitem__)
+            count = self._counts.pop(victim)
+            del self._items[victim]
+        self._counts[key] = (count or 0) + 1
+        self._items[key] = (target, payload)
+
+    def top(self, count: int) -> List[Tuple[str, UpstreamTarget, BaseModel]]:
+        keys = sorted(self._counts, key=self._counts.__getitem__, reverse=True)
+        return [(key, *self._items[key]) for key in keys[:count]]
+
+    def decay(self) -> None:
+        """Halve every count so keys that stopped trending age out."""
+        for key in list(self._counts):
+            self._counts[key] //= 2
+            if not self._counts[key]:
+                del self._counts[key]
+                del self._items[key]
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+
+class CacheWarmer:
+    """
+    Re-fetch the most requested queries of each vertical shortly before their
+    cache entries expire, within a fixed upstream request budget per cycle.
+    """
+
+    def __init__(self):
+        self.refreshed = 0
+        self.failed = 0
+        self.cycles = 0
+        self._hitters: Dict[str, HeavyHitters] = {}
+
+    def record(self, target: UpstreamTarget, key: str, payload: BaseModel) -> None:
+        hitters = self._hitters.get(target.vertical)
+        if hitters is None:
+            hitters = self._hitters[target.vertical] = HeavyHitters(
+                settings.WARMER_CAPACITY
+            )
+        hitters.add(key, target, payload)
+
+    async def candidates(self) -> List[Tuple[str, UpstreamTarget, BaseModel]]:
+        """Hot keys whose cache entry is missing or about to expire."""
+        per_vertical = []
+        for hitters in self._hitters.values():
+            due = []
+            for key, target, payload in hitters.top(settings.WARMER_TOP_KEYS):
+                remaining = await response_cache.ttl_remaining(key)
+                if remaining is None or remaining <= settings.WARMER_REFRESH_AHEAD:
+                    due.append((key, target, payload))
+            per_vertical.append(due)
+        # Round-robin across verticals so one cannot use up the whole budget.
+        return [
+            item
+            for group in zip_longest(*per_vertical)
+            for item in group
+            if item is not None
+        ]
+
+    async def warm_once(self, refresh: Refresh) -> None:
+        budget = settings.WARMER_BUDGET
+        semaphore = asyncio.Semaphore(settings.WARMER_CONCURRENCY)
+
+        async def warm(key: str, target: UpstreamTarget, payload: BaseModel):
+            async with semaphore:
+                try:
+                    await refresh(target, payload, key)
+                    self.refreshed += 1
+                except Exception:
+                    self.failed += 1
+
+        batch = [
+            (key, target, payload)
+            for key, target, payload in await self.candidates()
+            if circuit_breakers.get(target.name).state == CLOSED
+        ][:budget]
+        await asyncio.gather(*(warm(*item) for item in batch))
+        for hitters in self._hitters.values():
+            hitters.decay()
+        self.cycles += 1
+
+    async def run(self, refresh: Refresh) -> None:
+        while True:
+            await asyncio.sleep(settings.WARMER_INTERVAL)
+            await self.warm_once(refresh)
+
+    def stats(self) -> dict:
+        return {
+            "tracked": {
+                vertical: len(hitters) for vertical, hitters in self._hitters.items()
+            },
+            "cycles": self.cycles,
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+        }
+
+
+cache_warmer = CacheWarmer()
@@ -1,11 +1,13 @@
 from pydantic_settings import BaseSettings
+from app.core.config import settings
 
 
 class Constants:
-    BASE_URL_INLINE = "https://affiliate-en-us.kayakaffiliates.com/i/api/ads/inline/v1"
-    BASE_URL_COMPARETO = (
-        "https://affiliate-en-us.kayakaffiliates.com/i/api/ads/compareTo/v1"
+    AFFILIATE_HOST = (
+        settings.AFFILIATE_HOST or "https://affiliate-en-us.kayakaffiliates.com"
     )
+    BASE_URL_INLINE = AFFILIATE_HOST + "/i/api/ads/inline/v1"
+    BASE_URL_COMPARETO = AFFILIATE_HOST + "/i/api/ads/compareTo/v1"
     HOTEL_LIST_ENDPOINT = "/hotel/list"
     FLIGHT_LIST_ENDPOINT = "/flight/list"
     CAR_LIST_ENDPOINT = "/car/list"
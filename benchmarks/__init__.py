@@ -0,0 +1,6 @@
+import os
+
+# Settings require the API keys at import time; benchmarks never reach the
+# real affiliate API.
+os.environ.setdefault("INLINE_ADS_API_KEY", "benchmark")
+os.environ.setdefault("COMPARETO_ADS_API_KEY", "benchmark")
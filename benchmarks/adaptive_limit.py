@@ -0,0 +1,77 @@
+"""
+Behaviour of the adaptive concurrency limit against a simulated upstream:
+a healthy one with jittery latency (the stub's default lognormal profile,
+scaled down to run quickly), and one that slows down with the square of
+the calls in flight above its capacity.
+
+    python -m benchmarks.adaptive_limit
+
+The limit must not collapse on the healthy upstream, and must settle near
+the capacity of the overloaded one.
+"""
+
+import asyncio
+import math
+import random
+import time
+import benchmarks  # noqa: F401  (sets the API key env vars)
+from app.core.config import settings
+from app.core.limiter import AdaptiveLimiter
+
+MEDIAN_LATENCY = 0.004
+SIGMA = 0.4
+CALLS = 20000
+CLIENTS = 200
+CAPACITY = 30
+
+
+def create_limiter() -> AdaptiveLimiter:
+    return AdaptiveLimiter(
+        settings.ADAPTIVE_LIMIT_INITIAL,
+        settings.ADAPTIVE_LIMIT_MIN,
+        settings.ADAPTIVE_LIMIT_MAX,
+        settings.ADAPTIVE_LIMIT_BACKOFF,
+        settings.ADAPTIVE_LIMIT_LATENCY_TOLERANCE,
+        settings.ADAPTIVE_LIMIT_WINDOW,
+    )
+
+
+async def simulate(limiter: AdaptiveLimiter, overloaded: bool) -> float:
+    """Run CALLS calls from CLIENTS callers, return the lowest limit seen."""
+    rng = random.Random(0)
+    mu = math.log(MEDIAN_LATENCY)
+    remaining = CALLS
+    lowest = limiter.limit
+
+    async def client() -> None:
+        nonlocal remaining, lowest
+        while remaining > 0:
+            remaining -= 1
+            await limiter.acquire()
+            latency = rng.lognormvariate(mu, SIGMA)
+            if overloaded:
+                latency *= max(1.0, limiter.in_flight / CAPACITY) ** 2
+            started = time.perf_counter()
+            await asyncio.sleep(latency)
+            limiter.release(time.perf_counter() - started, False)
+            lowest = min(lowest, limiter.limit)
+
+    await asyncio.gather(*(client() for _ in range(CLIENTS)))
+    return lowest
+
+
+def run() -> None:
+    print(f"{'upstream':<12}{'lowest':>8}{'final':>8}{'drops':>7}")
+    for name, overloaded in (("healthy", False), ("overloaded", True)):
+        limiter = create_limiter()
+        lowest = asyncio.run(simulate(limiter, overloaded))
+        print(f"{name:<12}{lowest:>8.1f}{limiter.limit:>8.1f}{limiter.drops:>7}")
+        if overloaded:
+            assert limiter.drops > 0, "the limit never backed off"
+            assert limiter.limit < 3 * CAPACITY, "the limit did not follow capacity"
+        else:
+            assert lowest >= settings.ADAPTIVE_LIMIT_INITIAL, "the limit collapsed"
+
+
+if __name__ == "__main__":
+    run()
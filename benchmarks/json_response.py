@@ -0,0 +1,48 @@
+"""
+Compare the stdlib JSONResponse with FastJSONResponse and the pass-through
+envelope on synthetic ad payloads.
+
+    python -m benchmarks.json_response
+"""
+
+import json
+import timeit
+from fastapi.responses import JSONResponse, Response
+from benchmarks.payloads import PAYLOADS
+from app.utils.responses import FastJSONResponse, orjson
+
+
+def run(number: int = 500) -> None:
+    encoder = "orjson" if orjson is not None else "stdlib fallback"
+    print(f"FastJSONResponse encoder: {encoder}")
+    print(
+        f"{'payload':<14}{'bytes':>9}{'JSONResponse':>15}{'FastJSON':>12}{'splice':>10}"
+    )
+    for vertical, build in PAYLOADS.items():
+        for count in (10, 100):
+            ads = build(count)
+            raw = json.dumps(ads).encode("utf-8")
+            envelope = {"status_code": 200, "response": ads}
+
+            cases = {
+                "stdlib": lambda: JSONResponse(content=envelope),
+                "fast": lambda: FastJSONResponse(content=envelope),
+                "splice": lambda: Response(
+                    content=b'{"status_code":%d,"response":%s}' % (200, raw),
+                    media_type="application/json",
+                ),
+            }
+            timings = {
+                name: min(timeit.repeat(case, number=number, repeat=3)) / number
+                for name, case in cases.items()
+            }
+            print(
+                f"{vertical + ' x' + str(count):<14}{len(raw):>9}"
+                f"{timings['stdlib'] * 1e6:>13.1f}us"
+                f"{timings['fast'] * 1e6:>10.1f}us"
+                f"{timings['splice'] * 1e6:>8.1f}us"
+            )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,165 @@
+"""
+Open-loop load generator for the `/app/v1/...` routes.
+
+Sends requests at a fixed target rate for a fixed duration and reports
+throughput and latency percentiles per route:
+
+    python -m benchmarks.load --base-url http://127.0.0.1:8000 \\
+        --rps 200 --duration 30 --keys 500
+
+`--keys` is the number of distinct queries per route; fewer keys means a
+higher cache hit ratio. `--routes` limits the run to some routes. The
+latency of `/app/v1/batch/stream` is measured until the stream ends.
+
+Request bodies are built per send. The report includes the scheduling lag
+(how late requests left compared with the schedule) and the offered and
+achieved send rates, with a warning when the generator could not keep up
+and its own delays would distort the latencies.
+"""
+
+import argparse
+import asyncio
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+import httpx
+from benchmarks.payloads import request_bodies
+
+ROUTES = list(request_bodies(0))
+
+# The generator is considered overloaded above this p99 scheduling lag
+# (seconds) or below this fraction of the offered send rate.
+LAG_WARNING = 0.01
+RATE_WARNING = 0.95
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return float("nan")
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Results:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.lags: List[float] = []
+        self.offered_rps = 0.0
+        self.achieved_rps = 0.0
+
+    def report(self, elapsed: float) -> str:
+        lines = [
+            f"{'route':<32}{'ok':>8}{'err':>6}{'rps':>9}"
+            f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+        ]
+        for route in sorted(set(self.latencies) | set(self.errors)):
+            ordered = sorted(self.latencies[route])
+            lines.append(
+                f"{route:<32}{len(ordered):>8}{self.errors[route]:>6}"
+                f"{len(ordered) / elapsed:>9.1f}"
+                f"{percentile(ordered, 0.50) * 1000:>9.1f}"
+                f"{percentile(ordered, 0.95) * 1000:>9.1f}"
+                f"{percentile(ordered, 0.99) * 1000:>9.1f}"
+            )
+        every = sorted(value for values in self.latencies.values() for value in values)
+        lines.append(
+            f"{'all':<32}{len(every):>8}{sum(self.errors.values()):>6}"
+            f"{len(every) / elapsed:>9.1f}"
+            f"{percentile(every, 0.50) * 1000:>9.1f}"
+            f"{percentile(every, 0.95) * 1000:>9.1f}"
+            f"{percentile(every, 0.99) * 1000:>9.1f}"
+        )
+        lags = sorted(self.lags)
+        lag = percentile(lags, 0.99)
+        lines.append(
+            f"send rate: offered {self.offered_rps:.1f} rps, "
+            f"achieved {self.achieved_rps:.1f} rps; scheduling lag "
+            f"p50 {percentile(lags, 0.50) * 1000:.1f} ms, "
+            f"p99 {lag * 1000:.1f} ms, max {(lags[-1] if lags else 0) * 1000:.1f} ms"
+        )
+        if lag > LAG_WARNING or self.achieved_rps < self.offered_rps * RATE_WARNING:
+            lines.append(
+                "WARNING: the load generator fell behind its schedule; "
+                "latencies include its own delays. Lower --rps or run it on "
+                "a separate machine."
+            )
+        return "\n".join(lines)
+
+
+async def send(
+    client: httpx.AsyncClient, route: str, key: int, due: float, results: Results
+) -> None:
+    body = request_bodies(key)[route]
+    started = time.perf_counter()
+    results.lags.append(started - due)
+    try:
+        response = await client.post(route, json=body)
+    except httpx.HTTPError:
+        results.errors[route] += 1
+        return
+    results.statuses[route][response.status_code] += 1
+    if response.status_code >= 400:
+        results.errors[route] += 1
+        return
+    results.latencies[route].append(time.perf_counter() - started)
+
+
+async def run(
+    base_url: str,
+    rps: float,
+    duration: float,
+    keys: int,
+    routes: Optional[List[str]] = None,
+    concurrency: int = 1000,
+) -> Results:
+    routes = routes or ROUTES
+    results = Results()
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=30.0
+    ) as client:
+        tasks = set()
+        interval = 1.0 / rps
+        started = time.perf_counter()
+        sent = 0
+        while True:
+            # Schedule against the wall clock so slow responses do not lower
+            # the offered load (open loop).
+            due = started + sent * interval
+            now = time.perf_counter()
+            if due - started >= duration:
+                break
+            if due > now:
+                await asyncio.sleep(due - now)
+            route = routes[sent % len(routes)]
+            key = (sent // len(routes)) % keys
+            task = asyncio.ensure_future(send(client, route, key, due, results))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            sent += 1
+        results.offered_rps = rps
+        results.achieved_rps = sent / max(time.perf_counter() - started, duration)
+        if tasks:
+            await asyncio.wait(tasks)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--rps", type=float, default=100.0)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--keys", type=int, default=100)
+    parser.add_argument("--routes", nargs="*", choices=ROUTES)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    results = asyncio.run(
+        run(args.base_url, args.rps, args.duration, args.keys, args.routes)
+    )
+    print(results.report(time.perf_counter() - started))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Synthetic affiliate ad payloads shaped like the hotel, flight and car lists."""
+
+import random
+
+PROVIDERS = ["Booking.com", "Expedia", "Hotels.com", "Priceline", "Trip.com"]
+AIRLINES = ["United", "Delta", "American", "JetBlue", "Alaska", "Southwest"]
+CAR_COMPANIES = ["Hertz", "Avis", "Budget", "Enterprise", "Sixt", "Alamo"]
+
+
+def _price(rng: random.Random) -> dict:
+    price = round(rng.uniform(40, 900), 2)
+    return {"price": price, "currency": "USD", "localizedPrice": f"${price:,.2f}"}
+
+
+def _ad(rng: random.Random, index: int, provider: str) -> dict:
+    return {
+        "id": f"ad-{index}-{rng.randrange(10**8)}",
+        "provider": provider,
+        "headline": f"{provider} deals from {_price(rng)['localizedPrice']}",
+        "description": "Compare prices and find the best deal for your trip. " * 2,
+        "logoUrl": f"https://content.example.com/logos/{provider.lower()}.png",
+        "backgroundImageUrl": f"https://content.example.com/bg/{index}.jpg",
+        "deepLink": f"https://www.example.com/click?ad={index}&p={provider}",
+        "impressionUrl": f"https://www.example.com/imp?ad={index}",
+        "price": _price(rng),
+        "rank": index,
+    }
+
+
+def hotel_ads(count: int = 20, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    ads = []
+    for index in range(count):
+        ad = _ad(rng, index, rng.choice(PROVIDERS))
+        ad["hotel"] = {
+            "name": f"Hotel {index}",
+            "stars": rng.randint(1, 5),
+            "rating": round(rng.uniform(5, 10), 1),
+            "address": f"{rng.randint(1, 999)} Main Street",
+        }
+        ads.append(ad)
+    return {"ads": ads, "currency": "USD", "searchId": "hotel-search"}
+
+
+def flight_ads(count: int = 40, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    ads = []
+    for index in range(count):
+        ad = _ad(rng, index, rng.choice(AIRLINES))
+        ad["legs"] = [
+            {
+                "originAirport": "JFK",
+                "destinationAirport": "LAX",
+                "departure": "2030-01-01T08:00:00",
+                "arrival": "2030-01-01T11:30:00",
+                "stops": rng.randint(0, 2),
+                "cabin": "economy",
+            }
+            for _ in range(rng.randint(1, 2))
+        ]
+        ads.append(ad)
+    return {"ads": ads, "currency": "USD", "searchId": "flight-search"}
+
+
+def car_ads(count: int = 20, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    ads = []
+    for index in range(count):
+        ad = _ad(rng, index, rng.choice(CAR_COMPANIES))
+        ad["car"] = {
+            "class": rng.choice(["economy", "compact", "suv", "van"]),
+            "seats": rng.randint(2, 8),
+            "transmission": "automatic",
+        }
+        ads.append(ad)
+    return {"ads": ads, "currency": "USD", "searchId": "car-search"}
+
+
+PAYLOADS = {"hotel": hotel_ads, "flight": flight_ads, "car": car_ads}
+
+
+def request_bodies(key: int) -> dict:
+    """
+    Request bodies for every `/app/v1/...` route. `key` varies the cacheable
+    part of the query, so callers control the cache hit ratio. The batch
+    routes run all six single queries at once.
+    """
+    user = {"userTrackId": f"user-{key}", "clientIP": "203.0.113.10"}
+    hotel = {
+        **user,
+        "cityId": f"city-{key}",
+        "checkinDate": "2030-01-10",
+        "checkoutDate": "2030-01-12",
+        "currencyCode": "USD",
+    }
+    flight = {
+        **user,
+        "legs": [
+            {
+                "originAirport": "JFK",
+                "destinationAirport": "LAX",
+                "date": f"2030-01-{key % 28 + 1:02d}",
+            }
+        ],
+        "currencyCode": "USD",
+    }
+    car = {
+        **user,
+        "pickUpLocation": {"type": "city", "locationQuery": f"city-{key}"},
+        "pickUpDate": "2030-01-10",
+        "dropOffDate": "2030-01-12",
+        "currencyCode": "USD",
+    }
+    single = {
+        "/app/v1/inline/hotel-list": hotel,
+        "/app/v1/inline/flight-list": flight,
+        "/app/v1/inline/car-list": car,
+        "/app/v1/compareTo/hotel-list": {**hotel, "showOn": "frontDoor"},
+        "/app/v1/compareTo/flight-list": {**flight, "showOn": "resultsPage"},
+        "/app/v1/compareTo/car-list": {**car, "showOn": "search"},
+    }
+    # One batch query per single-query route, e.g. inline/hotel-list.
+    batch = {
+        "queries": [
+            {
+                "product": route.split("/")[3],
+                "vertical": route.split("/")[4][: -len("-list")],
+                "payload": body,
+            }
+            for route, body in single.items()
+        ]
+    }
+    return {
+        **single,
+        "/app/v1/batch": batch,
+        "/app/v1/batch/stream": batch,
+    }
@@ -0,0 +1,101 @@
+"""
+Per-request overhead of building the upstream call: the original per-handler
+code (URL concatenation, fresh params/headers dicts, `model_dump` with an
+inline exclude set, then the JSON encoding httpx does for `json=`) against
+the precompiled `UpstreamTarget` plan.
+
+    python -m benchmarks.request_building
+"""
+
+import json
+import timeit
+import benchmarks  # noqa: F401  (sets the API key env vars)
+from app.api.v1.compareTo.schemas import HotelInlineRequest as CompareToHotelRequest
+from app.api.v1.inline.schemas import FlightInlineRequest
+from app.core.config import settings
+from app.core.http import cookie_header
+from app.core.targets import TARGETS
+from app.utils.constants import constants
+from benchmarks.payloads import request_bodies
+
+COOKIES = {"session": "abc", "kayak": "xyz"}
+
+
+def encode(payload_data: dict) -> bytes:
+    # What httpx does with `json=payload_data`.
+    return json.dumps(payload_data, ensure_ascii=False, separators=(",", ":")).encode(
+        "utf-8"
+    )
+
+
+def original_flight(payload: FlightInlineRequest):
+    url = constants.BASE_URL_INLINE + constants.FLIGHT_LIST_ENDPOINT
+    params = {"apiKey": settings.INLINE_ADS_API_KEY, "userTrackId": payload.userTrackId}
+    headers = {
+        "Content-Type": "application/json",
+        "User-Agent": payload.userAgent,
+        "x-original-client-ip": payload.clientIP,
+        **cookie_header(COOKIES),
+    }
+    payload_data = payload.model_dump(
+        exclude={"userTrackId", "clientIP", "cookies", "userAgent"}, exclude_unset=True
+    )
+    return url, params, headers, encode(payload_data)
+
+
+def original_compare_to_hotel(payload: CompareToHotelRequest):
+    url = constants.BASE_URL_COMPARETO + constants.HOTEL_LIST_ENDPOINT
+    params = {
+        "apiKey": settings.COMPARETO_ADS_API_KEY,
+        "userTrackId": payload.userTrackId,
+    }
+    headers = {
+        "Content-Type": "application/json",
+        "User-Agent": payload.userAgent,
+        "x-original-client-ip": payload.clientIP,
+        **cookie_header(COOKIES),
+    }
+    payload_data = {
+        "showOn": payload.showOn,
+        "checkinDate": payload.checkinDate,
+        "checkoutDate": payload.checkoutDate,
+        "cityId": payload.cityId,
+    }
+    return url, params, headers, encode(payload_data)
+
+
+def planned(target, payload):
+    return (
+        target.url,
+        target.params(payload),
+        target.headers(payload, COOKIES),
+        target.body(payload),
+    )
+
+
+def run(number: int = 20000) -> None:
+    bodies = request_bodies(1)
+    flight = FlightInlineRequest(**bodies["/app/v1/inline/flight-list"])
+    hotel = CompareToHotelRequest(**bodies["/app/v1/compareTo/hotel-list"])
+    cases = [
+        (
+            "inline/flight",
+            lambda: original_flight(flight),
+            lambda: planned(TARGETS[("inline", "flight")], flight),
+        ),
+        (
+            "compareTo/hotel",
+            lambda: original_compare_to_hotel(hotel),
+            lambda: planned(TARGETS[("compareTo", "hotel")], hotel),
+        ),
+    ]
+    print(f"{'target':<18}{'original':>12}{'target plan':>14}")
+    for name, original, plan in cases:
+        assert original() == plan(), name
+        before = min(timeit.repeat(original, number=number, repeat=5)) / number
+        after = min(timeit.repeat(plan, number=number, repeat=5)) / number
+        print(f"{name:<18}{before * 1e6:>10.2f}us{after * 1e6:>12.2f}us")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,40 @@
+"""
+Request body decoding cost for the inline ad schemas: FastAPI's regular
+pipeline (`json.loads` into a dict, then model validation of that dict)
+against the opt-in fast decoder (`model_validate_json` on the raw bytes).
+
+    python -m benchmarks.request_decoding
+"""
+
+import json
+import timeit
+import benchmarks  # noqa: F401  (sets the API key env vars)
+from app.api.v1.inline.schemas import (
+    CarInlineRequest,
+    FlightInlineRequest,
+    HotelInlineRequest,
+)
+from benchmarks.payloads import request_bodies
+
+CASES = [
+    ("hotel", HotelInlineRequest, "/app/v1/inline/hotel-list"),
+    ("flight", FlightInlineRequest, "/app/v1/inline/flight-list"),
+    ("car", CarInlineRequest, "/app/v1/inline/car-list"),
+]
+
+
+def run(number: int = 20000) -> None:
+    bodies = request_bodies(1)
+    print(f"{'schema':<10}{'dict pipeline':>15}{'fast decoder':>15}")
+    for name, model, route in CASES:
+        raw = json.dumps(bodies[route]).encode("utf-8")
+        regular = lambda: model.model_validate(json.loads(raw))  # noqa: E731
+        fast = lambda: model.model_validate_json(raw)  # noqa: E731
+        assert regular() == fast(), name
+        before = min(timeit.repeat(regular, number=number, repeat=5)) / number
+        after = min(timeit.repeat(fast, number=number, repeat=5)) / number
+        print(f"{name:<10}{before * 1e6:>13.2f}us{after * 1e6:>13.2f}us")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,95 @@
+"""
+Local stand-in for the affiliate ads API.
+
+Serves the hotel, flight and car list endpoints for both the inline and
+compareTo products with configurable latency, payload size and error rate:
+
+    python -m benchmarks.stub_upstream --port 9000 \\
+        --latency lognormal:0.08:0.5 --car-latency uniform:0.2:0.6 \\
+        --ads 40 --error-rate 0.01
+
+Point the service at it with `AFFILIATE_HOST=http://127.0.0.1:9000`.
+
+Latency specs are `fixed:SECONDS`, `uniform:LOW:HIGH` or
+`lognormal:MEDIAN:SIGMA`.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+from typing import Callable, Dict
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+from benchmarks.payloads import PAYLOADS
+
+VERTICALS = ("hotel", "flight", "car")
+
+
+def latency_sampler(spec: str) -> Callable[[], float]:
+    kind, *args = spec.split(":")
+    values = [float(arg) for arg in args]
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "lognormal":
+        mu = math.log(values[0])
+        return lambda: random.lognormvariate(mu, values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def create_stub_app(
+    latencies: Dict[str, Callable[[], float]], ads: int, error_rate: float
+) -> FastAPI:
+    app = FastAPI(title="Affiliate API stub")
+    # Pre-render one body per vertical so the stub itself stays cheap.
+    bodies = {
+        vertical: json.dumps(PAYLOADS[vertical](ads)).encode("utf-8")
+        for vertical in VERTICALS
+    }
+    counters = {"requests": 0, "errors": 0}
+
+    @app.post("/i/api/ads/{product}/v1/{vertical}/list")
+    async def ads_list(product: str, vertical: str, request: Request):
+        await request.body()
+        counters["requests"] += 1
+        if vertical not in bodies or product not in ("inline", "compareTo"):
+            return JSONResponse({"error": "not found"}, status_code=404)
+        await asyncio.sleep(latencies[vertical]())
+        if random.random() < error_rate:
+            counters["errors"] += 1
+            return JSONResponse({"error": "stub failure"}, status_code=503)
+        return Response(bodies[vertical], media_type="application/json")
+
+    @app.get("/stats")
+    async def stats():
+        return counters
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", default="lognormal:0.08:0.4")
+    for vertical in VERTICALS:
+        parser.add_argument(f"--{vertical}-latency", default=None)
+    parser.add_argument("--ads", type=int, default=20, help="ads per response")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    latencies = {
+        vertical: latency_sampler(getattr(args, f"{vertical}_latency") or args.latency)
+        for vertical in VERTICALS
+    }
+    app = create_stub_app(latencies, args.ads, args.error_rate)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
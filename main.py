@@ -1,6 +1,86 @@
+import asyncio
+from contextlib import asynccontextmanager
+from functools import partial
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.api import router as app_router
+from app.core.admission import AdmissionMiddleware, admission_controller
+from app.core.breaker import circuit_breakers
+from app.core.bulkhead import bulkheads
+from app.core.cache import response_cache
+from app.core.compression import CompressionMiddleware, response_compressor
+from app.core.config import settings
+from app.core.http import (
+    UPSTREAM_HTTP2,
+    create_http_clients,
+    dns_cache,
+    prewarm_http_clients,
+)
+from app.core.hedging import hedger
+from app.core.limiter import adaptive_limiters
+from app.core.logs import AccessLogMiddleware, open_log_stream, structured_log
+from app.core.metrics import (
+    COLLECTORS,
+    MetricsMiddleware,
+    render_metrics,
+    stats_collector,
+)
+from app.core.prevalidation import query_validator
+from app.core.profiling import ProfilingMiddleware, request_profiler
+from app.core.retry import retry_policy
+from app.core.singleflight import upstream_flights
+from app.core.targets import TARGETS
+from app.core.timing import ServerTimingMiddleware
+from app.core.upstream import refresh_upstream
+from app.core.warmer import cache_warmer
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    log_stream = open_log_stream() if settings.LOG_ENABLED else None
+    if log_stream is not None:
+        structured_log.start(log_stream)
+    app.state.http_clients = create_http_clients(TARGETS.values())
+    if settings.UPSTREAM_PREWARM_CONNECTIONS > 0:
+        await prewarm_http_clients(app.state.http_clients, TARGETS.values())
+    warmer = None
+    if settings.CACHE_ENABLED and settings.WARMER_ENABLED:
+        warmer = asyncio.create_task(
+            cache_warmer.run(partial(refresh_upstream, app.state.http_clients))
+        )
+    try:
+        yield
+    finally:
+        if warmer is not None:
+            warmer.cancel()
+        await asyncio.gather(
+            *(client.aclose() for client in app.state.http_clients.values())
+        )
+        await asyncio.to_thread(structured_log.stop)
+        if log_stream is not None and settings.LOG_FILE:
+            log_stream.close()
+
+
+COLLECTORS.extend(
+    [
+        stats_collector("response_cache", response_cache.stats),
+        stats_collector("single_flight", upstream_flights.stats),
+        stats_collector("hedging", hedger.stats),
+        stats_collector("cache_warmer", cache_warmer.stats),
+        stats_collector("admission", admission_controller.stats),
+        circuit_breakers.collect,
+        adaptive_limiters.collect,
+        bulkheads.collect,
+        stats_collector("compression", response_compressor.stats),
+        stats_collector("structured_log", structured_log.stats),
+        stats_collector("upstream_retries", retry_policy.stats),
+        stats_collector("profiler", request_profiler.stats),
+        stats_collector("upstream_dns_cache", dns_cache.stats),
+        stats_collector("prevalidation", query_validator.stats),
+    ]
+)
+
 
 app = FastAPI(
     title="Redirect API",
@@ -8,15 +88,79 @@ app = FastAPI(
     docs_url="/docs",
     redoc_url="/redoc",
     openapi_url="/openapi.json",
+    lifespan=lifespan,
 )
 
 
+# Admission sits inside CORS so shed responses still carry CORS headers
+# and preflights are answered without taking a slot.
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(
+        AdmissionMiddleware,
+        controller=admission_controller,
+        path_prefix=app_router.prefix,
+        priority_prefixes=settings.ADMISSION_PRIORITY_PREFIXES,
+        retry_after=settings.ADMISSION_RETRY_AFTER,
+    )
+
 app.add_middleware(
     CORSMiddleware,
     allow_methods=["*"],
     allow_headers=["*"],
     allow_credentials=True,
     allow_origins=["*"],
+    expose_headers=["Retry-After"],
 )
 
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        compressor=response_compressor,
+        path_prefix=app_router.prefix,
+    )
+
+if settings.LOG_ENABLED:
+    app.add_middleware(
+        AccessLogMiddleware,
+        log=structured_log,
+        sample_rate=settings.LOG_ACCESS_SAMPLE_RATE,
+    )
+
+if settings.SERVER_TIMING_ENABLED:
+    app.add_middleware(ServerTimingMiddleware)
+
+if settings.PROFILE_ENABLED:
+    app.add_middleware(ProfilingMiddleware, profiler=request_profiler)
+
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(app_router)
+
+
+@app.get("/health", tags=["Health"])
+async def health():
+    return {
+        "status": "degraded" if circuit_breakers.any_open() else "ok",
+        "cache": response_cache.stats(),
+        "single_flight": upstream_flights.stats(),
+        "hedging": hedger.stats(),
+        "cache_warmer": cache_warmer.stats(),
+        "admission": admission_controller.stats(),
+        "circuit_breakers": circuit_breakers.stats(),
+        "upstream_limits": adaptive_limiters.stats(),
+        "bulkheads": bulkheads.stats(),
+        "compression": response_compressor.stats(),
+        "structured_log": structured_log.stats(),
+        "retries": retry_policy.stats(),
+        "profiler": request_profiler.stats(),
+        "upstream_http2": UPSTREAM_HTTP2,
+        "upstream_dns_cache": dns_cache.stats(),
+        "prevalidation": query_validator.stats(),
+    }
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(
+        render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )